@@ -8,6 +8,7 @@ from .nodes import (
     agent_node, 
     agent_node_with_streaming, 
     tool_node, 
+    atool_node,
     decide_next_step,
     parse_action_from_response
 )
@@ -16,7 +17,9 @@ from .runnable import (
     get_chat_history,
     get_current_input,
     get_agent_scratchpad,
+    build_prompt_inputs,
     get_agent_prompt,
+    get_bound_agent_prompt,
     get_llm_with_tools
 )
 from .workflow import create_agent_workflow, get_workflow_visualization
@@ -29,6 +32,7 @@ __all__ = [
     "agent_node",
     "agent_node_with_streaming", 
     "tool_node",
+    "atool_node",
     "decide_next_step",
     "parse_action_from_response",
     
@@ -37,7 +41,9 @@ __all__ = [
     "get_chat_history",
     "get_current_input", 
     "get_agent_scratchpad",
+    "build_prompt_inputs",
     "get_agent_prompt",
+    "get_bound_agent_prompt",
     "get_llm_with_tools",
     
     # Workflow
@@ -3,16 +3,48 @@ Node implementations for the Customer Support Agent workflow.
 Contains all the graph nodes including agent_node, tool_node, and their variants.
 """
 
-import re
-from typing import Literal
+import asyncio
+import atexit
+import os
+import contextvars
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from typing import Dict, Literal, Optional, Tuple
 from langchain_core.messages import BaseMessage, HumanMessage, AIMessage, ToolMessage
 
 from .state import AgentState
 from .runnable import get_agent_runnable
 from utils.logger import logger
-from utils.streaming import stream_response2
-from utils.response_extractor import extract_final_answer
-from tools import get_all_tools, execute_tool
+from utils.streaming import stream_response2, StreamInterrupted
+from utils.response_extractor import extract_final_answer, ACTION_RE
+from tools import execute_tool, is_speculative_safe, get_prewarm_hook
+
+
+# Upper bound on how many tool calls from a single agent step run at once
+TOOL_CONCURRENCY_LIMIT = int(os.getenv("TOOL_CONCURRENCY_LIMIT") or "8")
+
+# Worker threads for tool calls, shared across turns instead of created per call
+_TOOL_POOL = ThreadPoolExecutor(max_workers=TOOL_CONCURRENCY_LIMIT, thread_name_prefix="tool")
+atexit.register(_TOOL_POOL.shutdown, wait=False)
+
+# Read-only tool calls started by the agent node before tool_node runs,
+# keyed by (tool_name, tool_args) and holding (started_at, future); bounded
+# in number, and dropped after _SPECULATIVE_TTL seconds so an unclaimed
+# result is never handed to a later turn
+_SPECULATIVE_LIMIT = 32
+_SPECULATIVE_TTL = 10.0
+_speculative_calls: Dict[Tuple[str, str], Tuple[float, Future]] = {}
+_speculative_lock = threading.Lock()
+
+# Maps the agent's next_action to the node the workflow moves to
+_NEXT_STEP = {
+    "call_tool": "tool_node",
+    "respond": "respond_and_end"
+}
+
+# Builds ToolMessages from trusted string outputs without re-validating them
+_make_tool_message = ToolMessage.model_construct
 
 
 
@@ -26,17 +58,73 @@ def parse_action_from_response(content: str) -> dict:
     Returns:
         dict: Action information if found, None otherwise
     """
-    action_match = re.search(r"Action:\s*(.+)", content)
-    input_match = re.search(r"Action Input:\s*(.+)", content)
-    
-    if action_match and input_match:
-        return {
-            "action": action_match.group(1).strip(),
-            "action_input": input_match.group(1).strip()
-        }
+    # Jump between "Action:" markers with str.find and only run the regex
+    # anchored at each one, instead of trying a match at every offset
+    pos = content.find("Action:")
+    while pos != -1:
+        match = ACTION_RE.match(content, pos)
+        if match:
+            return {
+                "action": match.group("action").strip(),
+                "action_input": match.group("action_input").strip()
+            }
+        pos = content.find("Action:", pos + 1)
     return None
 
 
+def _prewarm_tool(tool_name: str) -> None:
+    """Run the tool's prewarm hook, if it has one, in the background."""
+    prewarm = get_prewarm_hook(tool_name)
+    if prewarm:
+        _TOOL_POOL.submit(prewarm)
+
+
+def _start_speculative_call(action_info: dict) -> None:
+    """
+    Start a read-only tool call before the graph reaches tool_node.
+    
+    The result is picked up by tool_node for the same (tool_name, tool_args);
+    tools not registered as speculative-safe are left alone.
+    """
+    tool_name = action_info["action"]
+    tool_args = action_info["action_input"]
+    if not is_speculative_safe(tool_name):
+        return
+    
+    key = (tool_name, tool_args)
+    now = time.monotonic()
+    with _speculative_lock:
+        _drop_stale_speculative_calls(now)
+        if key in _speculative_calls:
+            return
+        while len(_speculative_calls) >= _SPECULATIVE_LIMIT:
+            _speculative_calls.pop(next(iter(_speculative_calls)))
+        logger.debug("Speculatively starting tool {}", tool_name)
+        _speculative_calls[key] = (now, _TOOL_POOL.submit(
+            contextvars.copy_context().run, execute_tool, tool_name, tool_args
+        ))
+
+
+def _drop_stale_speculative_calls(now: float) -> None:
+    """Forget speculative calls older than _SPECULATIVE_TTL; the caller holds _speculative_lock."""
+    # Entries are inserted in start order, so the stale ones are at the front
+    while _speculative_calls:
+        key = next(iter(_speculative_calls))
+        if now - _speculative_calls[key][0] <= _SPECULATIVE_TTL:
+            break
+        del _speculative_calls[key]
+
+
+def _take_speculative_call(tool_name: str, tool_args) -> Optional[Future]:
+    """Claim the speculative call started for these arguments, if any."""
+    if not isinstance(tool_args, str):
+        return None
+    with _speculative_lock:
+        _drop_stale_speculative_calls(time.monotonic())
+        entry = _speculative_calls.pop((tool_name, tool_args), None)
+    return entry[1] if entry else None
+
+
 def agent_node(state: AgentState) -> AgentState:
     """
     Standard agent node that processes user input and decides next action.
@@ -82,84 +170,84 @@ def agent_node_with_streaming(state: AgentState) -> AgentState:
     Returns:
         Updated agent state with streamed response
     """
-    from .runnable import get_llm_with_tools, get_agent_prompt
-    from .runnable import get_chat_history, get_current_input, get_agent_scratchpad
+    from .runnable import get_llm_with_tools, get_bound_agent_prompt
+    from .runnable import build_prompt_inputs
 
+    messages = state["messages"]
     
-    agent_runnable = get_agent_runnable()
-    tools = get_all_tools()
-
+    # Create the enhanced state for streaming (tools are pre-bound in the prompt)
+    enhanced_state = {
+        "messages": messages,
+        **build_prompt_inputs(messages)
+    }
     
-    # Check if this should be a final response (no tool calls needed)
-    temp_response = agent_runnable.invoke(state)
-    action_info = parse_action_from_response(temp_response.content)
+    # Stream once and decide afterwards whether it was a tool call or a final answer
+    echoed = False
+    displayed = ""
+    try:
+        agent_prompt = get_bound_agent_prompt()
+        formatted_prompt = agent_prompt.invoke(enhanced_state)
+        
+        llm_with_tools = get_llm_with_tools()
+        content, echoed = stream_response2(llm_with_tools, formatted_prompt, prefix="Agent: ", on_action=_prewarm_tool)
+        
+    except Exception as e:
+        logger.debug("\nStreaming error: {}", e)
+        # Fallback to a regular, non-streamed invocation
+        echoed = False
+        displayed = e.displayed if isinstance(e, StreamInterrupted) else ""
+        content = get_agent_runnable().invoke(state).content
+    
+    action_info = parse_action_from_response(content)
     
     if action_info:
-        # Tool call needed - no streaming, just return normally
         logger.debug("\n--- AGENT DECIDED TO CALL A TOOL ---")
+        # Overlap the tool call with checkpointing and routing to tool_node
+        _start_speculative_call(action_info)
         return {
-            "messages": [temp_response],
+            "messages": [AIMessage(content=content)],
             "next_action": "call_tool", 
             "actions": [action_info]
         }
+    
+    logger.debug("\n--- AGENT RESPONDED (STREAMING) ---")
+    if "Final Answer:" in content:
+        clean_answer = extract_final_answer(content)
     else:
-        # Final response - stream it!
-        logger.debug("\n--- AGENT RESPONDING (STREAMING) ---")
-        logger.info("Agent: ", end='', flush=True)
-
-        try:
-            # Create the enhanced state for streaming
-            enhanced_state = {
-                "messages": state["messages"],
-                "tools": tools,
-                "tool_names": [t.name for t in tools],
-                "input": get_current_input(state["messages"]),
-                "chat_history": get_chat_history(state["messages"]),
-                "agent_scratchpad": get_agent_scratchpad(state["messages"])
-            }
-            buffer = ""
-            # Format with the prompt
-            agent_prompt = get_agent_prompt()
-            formatted_prompt = agent_prompt.invoke(enhanced_state)
-            
-            # Stream from the LLM
-            llm_with_tools = get_llm_with_tools()
-            ai_message=stream_response2(llm_with_tools, formatted_prompt)
-            
-            logger.info("")  # New line after streaming
-
-
-            
-        except Exception as e:
-            logger.debug(f"\nStreaming error: {e}")
-            # Fallback to the temp_response
-            ai_message = temp_response
-        
-        return {
-            "messages": [ai_message],
-            "next_action": "respond"
-        }
+        clean_answer = content.strip()
+    
+    if echoed:
+        logger.info("")  # New line after streaming
+    elif displayed and clean_answer.startswith(displayed):
+        # Streaming failed part way through; show only what is still missing
+        logger.info("{}", clean_answer[len(displayed):])
+    elif displayed:
+        logger.info("\nAgent: {}", clean_answer)
+    else:
+        # Nothing was displayed while streaming
+        logger.info("Agent: {}", clean_answer)
+    
+    return {
+        "messages": [AIMessage(content=clean_answer)],
+        "next_action": "respond"
+    }
 
 
-def tool_node(state: AgentState) -> AgentState:
+def _prepare_tool_calls(actions: list) -> tuple[list, list]:
     """
-    Tool execution node that processes tool calls and returns results.
+    Validate tool actions before they are executed.
     
     Args:
-        state: Current agent state with tool actions to execute
+        actions: Tool actions requested by the agent
         
     Returns:
-        Updated agent state with tool outputs
+        tuple: (tool_outputs, pending_calls)
+        tool_outputs is pre-sized to len(actions) with malformed calls already answered,
+        pending_calls holds (index, tool_name, tool_args) for every call to execute
     """
-    
-    messages = state["messages"]
-    actions = state["actions"]
-    last_message = messages[-1] if messages else None
-    
-    logger.debug("Processing tool calls: {}", actions)
-    
-    tool_outputs = []
-    for action_info in actions:
+    tool_outputs = [None] * len(actions)
+    pending_calls = []
+    for idx, action_info in enumerate(actions):
         logger.debug("\n--- PROCESSING TOOL CALL: {} ---", action_info)
         
         if isinstance(action_info, dict):
@@ -171,32 +259,81 @@ def tool_node(state: AgentState) -> AgentState:
             
         if not tool_name or not tool_args:
             logger.debug("ERROR: Malformed tool call item: {}", action_info)
-            tool_outputs.append(
-                ToolMessage(
-                    content="Error: Malformed tool call received.", 
-                    tool_call_id=str(tool_name) if tool_name else "unknown"
-                )
+            tool_outputs[idx] = ToolMessage(
+                content="Error: Malformed tool call received.", 
+                tool_call_id=str(tool_name) if tool_name else "unknown"
             )
             continue
-            
-        # Execute the tool
+        
+        pending_calls.append((idx, tool_name, tool_args))
+    
+    return tool_outputs, pending_calls
+
+
+def _tool_result_message(tool_name: str, output) -> ToolMessage:
+    """Wrap a tool output, or the exception the tool raised, into a ToolMessage."""
+    if isinstance(output, Exception):
+        logger.debug("Error executing tool {}: {}", tool_name, output)
+        return ToolMessage(
+            content=f"Error: Failed to execute tool {tool_name}: {str(output)}", 
+            tool_call_id=tool_name
+        )
+    
+    logger.debug("Output from {}: {}", tool_name, output)
+    if isinstance(output, str):
+        # Already the shape ToolMessage expects; skip pydantic validation
+        return _make_tool_message(content=output, tool_call_id=tool_name)
+    # Non-string outputs (e.g. dicts) still need ToolMessage's content coercion
+    return ToolMessage(
+        content=output, 
+        tool_call_id=tool_name
+    )
+
+
+def tool_node(state: AgentState) -> AgentState:
+    """
+    Tool execution node that processes tool calls and returns results.
+    
+    Args:
+        state: Current agent state with tool actions to execute
+        
+    Returns:
+        Updated agent state with tool outputs
+    """
+    actions = state["actions"]
+    
+    logger.debug("Processing tool calls: {}", actions)
+    
+    tool_outputs, pending_calls = _prepare_tool_calls(actions)
+    
+    if len(pending_calls) == 1:
+        # The ReAct loop emits one action per turn; run it inline rather than
+        # paying for a pool hand-off and a context copy
+        idx, tool_name, tool_args = pending_calls[0]
+        future = _take_speculative_call(tool_name, tool_args)
         try:
-            output = execute_tool(tool_name, tool_args)
-            logger.debug("Output from {}: {}", tool_name, output)
-            tool_outputs.append(
-                ToolMessage(
-                    content=output, 
-                    tool_call_id=tool_name
-                )
-            )
+            output = future.result() if future else execute_tool(tool_name, tool_args)
         except Exception as e:
-            logger.debug("Error executing tool {}: {}", tool_name, e)
-            tool_outputs.append(
-                ToolMessage(
-                    content=f"Error: Failed to execute tool {tool_name}: {str(e)}", 
-                    tool_call_id=tool_name
-                )
-            )
+            output = e
+        tool_outputs[idx] = _tool_result_message(tool_name, output)
+    elif pending_calls:
+        # Tools are mostly I/O-bound (HTTP, DB), so independent calls run concurrently.
+        # Each call gets a copy of the current context so the LangGraph runtime
+        # (used by tools via get_runtime) is visible inside the worker thread.
+        futures = {
+            (
+                _take_speculative_call(tool_name, tool_args)
+                or _TOOL_POOL.submit(contextvars.copy_context().run, execute_tool, tool_name, tool_args)
+            ): (idx, tool_name)
+            for idx, tool_name, tool_args in pending_calls
+        }
+        for future in as_completed(futures):
+            idx, tool_name = futures[future]
+            try:
+                output = future.result()
+            except Exception as e:
+                output = e
+            tool_outputs[idx] = _tool_result_message(tool_name, output)
             
     return {
         "messages": tool_outputs, 
@@ -204,6 +341,48 @@ def tool_node(state: AgentState) -> AgentState:
     }
 
 
+async def atool_node(state: AgentState) -> AgentState:
+    """
+    Async variant of tool_node used when the graph runs on an event loop.
+    
+    Tool calls are dispatched to worker threads and awaited together, so the
+    event loop is never blocked and independent calls overlap their waits.
+    
+    Args:
+        state: Current agent state with tool actions to execute
+        
+    Returns:
+        Updated agent state with tool outputs
+    """
+    actions = state["actions"]
+    
+    logger.debug("Processing tool calls: {}", actions)
+    
+    tool_outputs, pending_calls = _prepare_tool_calls(actions)
+    
+    if pending_calls:
+        semaphore = asyncio.Semaphore(TOOL_CONCURRENCY_LIMIT)
+        
+        async def run_tool(tool_name, tool_args):
+            future = _take_speculative_call(tool_name, tool_args)
+            if future:
+                return await asyncio.wrap_future(future)
+            async with semaphore:
+                return await asyncio.to_thread(execute_tool, tool_name, tool_args)
+        
+        results = await asyncio.gather(
+            *(run_tool(tool_name, tool_args) for _, tool_name, tool_args in pending_calls),
+            return_exceptions=True
+        )
+        for (idx, tool_name, _), output in zip(pending_calls, results):
+            tool_outputs[idx] = _tool_result_message(tool_name, output)
+    
+    return {
+        "messages": tool_outputs, 
+        "next_action": "respond"
+    }
+
+
 def decide_next_step(state: AgentState) -> Literal["tool_node", "respond_and_end"]:
     """
     Decision function to determine the next step in the workflow.
@@ -214,10 +393,7 @@ def decide_next_step(state: AgentState) -> Literal["tool_node", "respond_and_end
     Returns:
         Next node to execute in the workflow
     """
-    if state["next_action"] == "call_tool":
+    next_action = state["next_action"]
+    if next_action == "call_tool":
         logger.debug("\n--- DECIDING NEXT STEP: CALL TOOL ---")
-        return "tool_node"
-    elif state["next_action"] == "respond":
-        return "respond_and_end"
-    else:
-        return "respond_and_end"
\ No newline at end of file
+    return _NEXT_STEP.get(next_action, "respond_and_end")
\ No newline at end of file
@@ -3,15 +3,16 @@ Agent runnable chain setup for the Customer Support Agent.
 Handles the creation and configuration of the agent's runnable chain.
 """
 
+from functools import lru_cache
 from typing import List
 from langchain_core.messages import BaseMessage, HumanMessage, AIMessage, ToolMessage
-from langchain_core.runnables import RunnablePassthrough
+from langchain_core.runnables import RunnableLambda
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain.schema import BaseMessage, PromptValue
 from langchain.schema.runnable import Runnable
 from typing import Sequence, Any
 from prompts import get_agent_prompt
-from tools import get_all_tools
+from tools import get_all_tools, get_tool_names
 from config.settings import get_model_config
 
 
@@ -56,13 +57,27 @@ def get_agent_scratchpad(messages: List[BaseMessage]) -> List[BaseMessage]:
     Returns:
         List of AI and Tool messages for the scratchpad
     """
-    scratchpad = []
-    for msg in messages:
-        if isinstance(msg, AIMessage):
-            scratchpad.append(msg)
-        elif isinstance(msg, ToolMessage):
-            scratchpad.append(msg)
-    return scratchpad
+    return [msg for msg in messages if isinstance(msg, (AIMessage, ToolMessage))]
+
+
+def build_prompt_inputs(messages: List[BaseMessage]) -> dict:
+    """
+    Derive the per-turn prompt variables from the conversation messages.
+    
+    Both the agent runnable and the streaming node build their prompt from
+    this, so each turn walks the message list exactly once per variable.
+    
+    Args:
+        messages: List of conversation messages
+        
+    Returns:
+        dict with input, chat_history and agent_scratchpad
+    """
+    return {
+        "input": get_current_input(messages),
+        "chat_history": get_chat_history(messages),
+        "agent_scratchpad": get_agent_scratchpad(messages)
+    }
 
 
 # def get_agent_prompt():
@@ -75,19 +90,56 @@ def get_agent_scratchpad(messages: List[BaseMessage]) -> List[BaseMessage]:
 #     return hub.pull("hwchase17/react-chat")
 
 
+def _model_cache_key() -> tuple:
+    """Key identifying the model settings and tool set the agent is built from."""
+    model_config = get_model_config()
+    return model_config["name"], model_config["temperature"], tuple(get_tool_names())
+
+
+def get_bound_agent_prompt():
+    """
+    Get the agent prompt with the tool sections already filled in.
+    
+    tools and tool_names only change when the registry does, so they are
+    rendered into the template once instead of on every turn; callers only
+    supply input, chat_history and agent_scratchpad.
+    
+    Returns:
+        The agent prompt template with tools and tool_names bound
+    """
+    return _build_bound_agent_prompt(tuple(get_tool_names()))
+
+
+@lru_cache(maxsize=1)
+def _build_bound_agent_prompt(tool_names: tuple):
+    """Render the tool sections into the agent prompt (cached by get_bound_agent_prompt)."""
+    return get_agent_prompt().partial(
+        tools=str(get_all_tools()),
+        tool_names=str(list(tool_names))
+    )
+
+
 def get_llm_with_tools() -> Runnable[PromptValue | str | Sequence[BaseMessage | list[str] | tuple[str, str] | str | dict[str, Any]], BaseMessage]:
     """
     Initialize and configure the LLM with tools.
     
+    The LLM is built once and reused until the model config or the
+    registered tools change.
+    
     Returns:
         Configured LLM instance with bound tools
     """
-    model_config = get_model_config()
+    return _build_llm_with_tools(*_model_cache_key())
+
+
+@lru_cache(maxsize=1)
+def _build_llm_with_tools(model_name: str, temperature: float, tool_names: tuple):
+    """Build the LLM with tools bound (cached by get_llm_with_tools)."""
     tools = get_all_tools()
     
     llm = ChatGoogleGenerativeAI(
-        model=model_config["name"],
-        temperature=model_config["temperature"],
+        model=model_name,
+        temperature=temperature,
     ).bind_tools(tools)
     
     return llm
@@ -97,24 +149,26 @@ def get_agent_runnable():
     """
     Create and return the complete agent runnable chain.
     
+    The chain is built once and reused until the model config or the
+    registered tools change.
+    
     Returns:
         Configured runnable chain for the agent
     """
+    return _build_agent_runnable(*_model_cache_key())
 
-    tools = get_all_tools()
-    agent_prompt = get_agent_prompt()
-    llm_with_tools = get_llm_with_tools()
+
+@lru_cache(maxsize=1)
+def _build_agent_runnable(model_name: str, temperature: float, tool_names: tuple):
+    """Build the agent runnable chain (cached by get_agent_runnable)."""
+
+    agent_prompt = _build_bound_agent_prompt(tool_names)
+    llm_with_tools = _build_llm_with_tools(model_name, temperature, tool_names)
     
     agent_runnable = (
-        RunnablePassthrough.assign(
-            tools=lambda x: tools,
-            tool_names=lambda x: [t.name for t in tools],
-            input=lambda x: get_current_input(x["messages"]),
-            chat_history=lambda x: get_chat_history(x["messages"]),
-            agent_scratchpad=lambda x: get_agent_scratchpad(x["messages"])
-        )
+        RunnableLambda(lambda x: {**x, **build_prompt_inputs(x["messages"])})
         | agent_prompt
         | llm_with_tools
     )
     
-    return agent_runnable
\ No newline at end of file
+    return agent_runnable
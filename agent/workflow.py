@@ -2,41 +2,52 @@
 Graph construction and compilation for the Customer Support Agent.
 Defines the workflow structure and compiles the LangGraph.
 """
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Tuple
+from langchain_core.runnables import RunnableLambda
 from langgraph.graph import StateGraph, START, END
 
 from .state import AgentState
-from .nodes import agent_node, agent_node_with_streaming, tool_node, decide_next_step
+from .nodes import agent_node, agent_node_with_streaming, tool_node, atool_node, decide_next_step
 from config import get_streaming_config
+from utils.logger import logger
 from psycopg import Connection
 from langgraph.checkpoint.postgres import PostgresSaver
 
-def create_agent_workflow(db_connection: Connection):
+# Compiled apps keyed by (id(db_connection), use_streaming), least recently
+# used first. The connection is kept next to the app so a recycled id() can
+# never return a stale app. The app holds its connection through the
+# checkpointer, so a WeakKeyDictionary would never release either; instead
+# the cache is bounded and drops entries whose connection has been closed.
+_APP_CACHE_SIZE = 4
+_APP_CACHE: "OrderedDict[Tuple[int, bool], Tuple[Connection, Any]]" = OrderedDict()
+
+
+@lru_cache(maxsize=2)
+def _build_uncompiled_workflow(use_streaming: bool) -> StateGraph:
     """
-    Create and compile the agent workflow graph.
+    Build the workflow graph (nodes and edges) without compiling it.
     
     Args:
-        db_connection: PostgreSQL database connection for checkpointing
+        use_streaming: Whether to use the streaming agent node
         
     Returns:
-        Compiled LangGraph application
+        Uncompiled LangGraph state graph
     """
-    # Get streaming configuration
-    streaming_config = get_streaming_config()
-    use_streaming = streaming_config.get("enabled", True)
-    
     # Create the workflow
     workflow = StateGraph(AgentState)
     
     # Choose which agent node to use based on streaming preference
     if use_streaming:
         workflow.add_node("agent", agent_node_with_streaming)
-        print("Using streaming agent node")
+        logger.debug("Using streaming agent node")
     else:
         workflow.add_node("agent", agent_node)
-        print("Using standard agent node")
+        logger.debug("Using standard agent node")
     
-    # Add tool node
-    workflow.add_node("tool_node", tool_node)
+    # Add tool node (sync for invoke/stream, async for ainvoke/astream)
+    workflow.add_node("tool_node", RunnableLambda(tool_node, afunc=atool_node, name="tool_node"))
     
     # Define the workflow edges
     workflow.add_edge(START, "agent")
@@ -54,6 +65,37 @@ def create_agent_workflow(db_connection: Connection):
     # Tool node always goes back to agent
     workflow.add_edge("tool_node", "agent")
     
+    return workflow
+
+
+def create_agent_workflow(db_connection: Connection):
+    """
+    Create and compile the agent workflow graph.
+    
+    The compiled app is cached per database connection, so repeated calls
+    with the same connection skip graph construction and checkpointer setup.
+    
+    Args:
+        db_connection: PostgreSQL database connection for checkpointing
+        
+    Returns:
+        Compiled LangGraph application
+    """
+    # Get streaming configuration
+    streaming_config = get_streaming_config()
+    use_streaming = streaming_config.get("enabled", True)
+    
+    for key in [key for key, (conn, _) in _APP_CACHE.items() if conn.closed]:
+        del _APP_CACHE[key]
+    
+    cache_key = (id(db_connection), use_streaming)
+    cached = _APP_CACHE.get(cache_key)
+    if cached and cached[0] is db_connection:
+        _APP_CACHE.move_to_end(cache_key)
+        return cached[1]
+    
+    workflow = _build_uncompiled_workflow(use_streaming)
+    
     # Create the checkpointer with the passed connection
     checkpointer = PostgresSaver(db_connection)
     
@@ -62,8 +104,12 @@ def create_agent_workflow(db_connection: Connection):
     
     # Compile the workflow with checkpointing
     app = workflow.compile(checkpointer=checkpointer)
+    _APP_CACHE[cache_key] = (db_connection, app)
+    _APP_CACHE.move_to_end(cache_key)
+    while len(_APP_CACHE) > _APP_CACHE_SIZE:
+        _APP_CACHE.popitem(last=False)
     
-    print("Agent workflow compiled successfully!")
+    logger.debug("Agent workflow compiled successfully!")
     return app
 
 def get_workflow_visualization(app):
@@ -79,5 +125,5 @@ def get_workflow_visualization(app):
     try:
         return app.get_graph().draw_mermaid()
     except Exception as e:
-        print(f"Could not generate workflow visualization: {e}")
+        logger.debug("Could not generate workflow visualization: {}", e)
         return None
\ No newline at end of file
@@ -0,0 +1,60 @@
+"""halfvec embeddings
+
+Revision ID: 5f3a9c1d7e42
+Revises: c2e0daa22197
+Create Date: 2025-10-15 10:12:41.518203
+
+"""
+from typing import Sequence, Union
+
+from pgvector.sqlalchemy import Vector, HALFVEC
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5f3a9c1d7e42'
+down_revision: Union[str, Sequence[str], None] = 'c2e0daa22197'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Store embeddings as fp16 (halfvec, pgvector >= 0.7): half the bytes per
+    # row and per index page. The ANN index is tied to the column's operator
+    # class, so it is rebuilt around the type change.
+    op.execute("DROP INDEX IF EXISTS idx_semantic_memories_embedding")
+    op.alter_column(
+        'semantic_memories',
+        'embedding',
+        existing_type=Vector(dim=768),
+        type_=HALFVEC(dim=768),
+        existing_nullable=True,
+        postgresql_using='embedding::halfvec(768)'
+    )
+    op.execute("""
+        CREATE INDEX idx_semantic_memories_embedding
+        ON semantic_memories
+        USING ivfflat (embedding halfvec_cosine_ops)
+        WITH (lists = 100)
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP INDEX IF EXISTS idx_semantic_memories_embedding")
+    op.alter_column(
+        'semantic_memories',
+        'embedding',
+        existing_type=HALFVEC(dim=768),
+        type_=Vector(dim=768),
+        existing_nullable=True,
+        postgresql_using='embedding::vector(768)'
+    )
+    op.execute("""
+        CREATE INDEX idx_semantic_memories_embedding
+        ON semantic_memories
+        USING ivfflat (embedding vector_cosine_ops)
+        WITH (lists = 100)
+    """)
@@ -0,0 +1,54 @@
+"""hnsw memory index
+
+Revision ID: 8b61e4f0a2c9
+Revises: 5f3a9c1d7e42
+Create Date: 2025-10-15 11:04:27.903614
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8b61e4f0a2c9'
+down_revision: Union[str, Sequence[str], None] = '5f3a9c1d7e42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # HNSW keeps good recall without the training step ivfflat needs, and
+    # the composite index serves per-user filtering and newest-first listing
+    op.execute("DROP INDEX IF EXISTS idx_semantic_memories_embedding")
+    op.create_index(
+        'semantic_memories_embedding_hnsw',
+        'semantic_memories',
+        ['embedding'],
+        unique=False,
+        postgresql_using='hnsw',
+        postgresql_with={'m': 16, 'ef_construction': 64},
+        postgresql_ops={'embedding': 'halfvec_cosine_ops'},
+        if_not_exists=True
+    )
+    op.create_index(
+        'ix_semantic_memories_user_id_created_at',
+        'semantic_memories',
+        ['user_id', 'created_at'],
+        unique=False,
+        if_not_exists=True
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_semantic_memories_user_id_created_at', table_name='semantic_memories', if_exists=True)
+    op.drop_index('semantic_memories_embedding_hnsw', table_name='semantic_memories', if_exists=True)
+    op.execute("""
+        CREATE INDEX idx_semantic_memories_embedding
+        ON semantic_memories
+        USING ivfflat (embedding halfvec_cosine_ops)
+        WITH (lists = 100)
+    """)
@@ -0,0 +1,57 @@
+"""inner product memory index
+
+Revision ID: d4c7a0b95e13
+Revises: 8b61e4f0a2c9
+Create Date: 2025-10-15 13:26:09.471580
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4c7a0b95e13'
+down_revision: Union[str, Sequence[str], None] = '8b61e4f0a2c9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Embeddings are now stored at unit length, where inner product equals
+    # cosine similarity but skips the norm computation per comparison.
+    # Rescale rows written before that, then index with inner-product ops.
+    op.drop_index('semantic_memories_embedding_hnsw', table_name='semantic_memories', if_exists=True)
+    op.execute("""
+        UPDATE semantic_memories
+        SET embedding = l2_normalize(embedding)
+        WHERE embedding IS NOT NULL
+    """)
+    op.create_index(
+        'semantic_memories_embedding_hnsw_ip',
+        'semantic_memories',
+        ['embedding'],
+        unique=False,
+        postgresql_using='hnsw',
+        postgresql_with={'m': 16, 'ef_construction': 64},
+        postgresql_ops={'embedding': 'halfvec_ip_ops'},
+        if_not_exists=True
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Normalized rows remain valid for cosine distance, so only the index changes
+    op.drop_index('semantic_memories_embedding_hnsw_ip', table_name='semantic_memories', if_exists=True)
+    op.create_index(
+        'semantic_memories_embedding_hnsw',
+        'semantic_memories',
+        ['embedding'],
+        unique=False,
+        postgresql_using='hnsw',
+        postgresql_with={'m': 16, 'ef_construction': 64},
+        postgresql_ops={'embedding': 'halfvec_cosine_ops'},
+        if_not_exists=True
+    )
@@ -2,9 +2,12 @@
 from typing import List, Optional
 from sqlalchemy.orm import Session
 from core.database import get_db
+from core.exceptions import CustomException
 from models import SemanticMemory
-from sentence_transformers import SentenceTransformer
+from utils.embeddings import get_embedding_model, encode_cached_array
 from sqlalchemy import func, text
+from pgvector import HalfVector
+import numpy as np
 import logging
 
 logger = logging.getLogger(__name__)
@@ -13,22 +16,28 @@ logger = logging.getLogger(__name__)
 class MemoryService:
     def __init__(self, db: Session):
         self.db = db
-        self.embedding_model = SentenceTransformer(
-            "nomic-ai/nomic-embed-text-v1.5", trust_remote_code=True
-        )
 
-    def get_embedding(self, text: str, is_query: bool = False) -> List[float]:
+    @property
+    def embedding_model(self):
+        # Shared across requests and loaded on first use
+        return get_embedding_model()
+
+    def get_embedding(self, text: str, is_query: bool = False) -> np.ndarray:
         try:
             prefix = "search_query: " if is_query else "search_document: "
             text = f"{prefix}{text}"
-            embedding = self.embedding_model.encode(text, convert_to_numpy=True)
-            return embedding.tolist()
+            return encode_cached_array(self.embedding_model, text)
         except Exception as e:
             logger.error(f"Error getting embedding: {e}")
-            return [0.0] * 768  # fallback vector
+            return np.zeros(768, dtype=np.float32)  # fallback vector
 
     def add_memory(self, user_id: str, content: str, importance: str = "medium"):
         embedding = self.get_embedding(content, is_query=False)
+        # The zero fallback has no direction, so a row stored with it could
+        # never be found by a similarity search; refuse it like the agent tools do
+        if not embedding.any():
+            logger.error(f"Refusing to store memory for user {user_id}: content could not be embedded")
+            raise CustomException(status_code=503, message="Error storing memory: could not embed the content")
 
         new_memory = SemanticMemory(
             user_id=user_id,
@@ -60,26 +69,43 @@ class MemoryService:
         # Generate query embedding
         query_embedding = self.get_embedding(search_text, is_query=True)
 
+        # HNSW search settings for the session's current transaction only;
+        # iterative scans (pgvector >= 0.8) keep the user_id filter from
+        # cutting results short
+        self.db.execute(text("SET LOCAL hnsw.ef_search = 40"))
+        self.db.execute(text("SET LOCAL hnsw.iterative_scan = relaxed_order"))
+
+        # Ordering by the bare distance lets the planner use the HNSW index;
+        # the outer query restores exact order after the relaxed scan.
+        # Embeddings are unit length, so <#> (negative inner product) is
+        # minus the cosine similarity. The distance is computed once per row;
+        # since candidates are nearest-first, applying the threshold after
+        # the LIMIT keeps exactly the rows that pass it.
         sql = text("""
-            SELECT 
-                id,
-                content,
-                importance,
-                created_at,
-                1 - (embedding <=> (:embedding)::vector) AS similarity
-            FROM semantic_memories
-            WHERE user_id = :user_id
-            AND 1 - (embedding <=> (:embedding)::vector) > :threshold
-            ORDER BY similarity DESC
-            LIMIT :top_k
+            WITH candidates AS MATERIALIZED (
+                SELECT
+                    id,
+                    content,
+                    importance,
+                    created_at,
+                    embedding <#> :embedding AS distance
+                FROM semantic_memories
+                WHERE user_id = :user_id
+                ORDER BY distance
+                LIMIT :top_k
+            )
+            SELECT id, content, importance, created_at, -distance AS similarity
+            FROM candidates
+            WHERE distance < :max_distance
+            ORDER BY distance
         """)
 
         rows = self.db.execute(
             sql,
             {
-                "embedding": f"[{','.join(map(str, query_embedding))}]",  # send as pgvector literal
+                "embedding": HalfVector(query_embedding),  # sent as binary halfvec
                 "user_id": user_id,
-                "threshold": similarity_threshold,
+                "max_distance": -similarity_threshold,
                 "top_k": top_k,
             }
         ).fetchall()
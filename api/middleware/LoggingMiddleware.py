@@ -0,0 +1,47 @@
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class LoggingMiddleware:
+    """
+    Log requests and responses.
+
+    Written as plain ASGI middleware rather than BaseHTTPMiddleware so a
+    request does not pay for an extra task group and Request/Response objects.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        # Checked once so a filtered-out request skips the path decode too
+        if not logger.isEnabledFor(logging.INFO):
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.perf_counter()
+        method = scope["method"]
+        raw_path = scope.get("raw_path")
+        path = raw_path.decode("latin-1") if raw_path is not None else scope["path"]
+        status_code = None
+
+        # Log request
+        logger.info("📥 %s %s", method, path)
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+        # Log response
+        process_time = time.perf_counter() - start_time
+        logger.info("📤 %s %s - %s - %.4fs", method, path, status_code, process_time)
@@ -6,6 +6,8 @@ from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
 from sqlalchemy.exc import SQLAlchemyError
 from contextlib import contextmanager
+from psycopg import ProgrammingError
+from pgvector.psycopg import register_vector
 from core import constants 
 
 logger = logging.getLogger(__name__)
@@ -26,6 +28,19 @@ engine = create_engine(
     }
 )
 
+@event.listens_for(engine, "connect")
+def _register_vector_types(dbapi_connection, connection_record):
+    """Let raw statements bind pgvector values (HalfVector) in binary form."""
+    try:
+        register_vector(dbapi_connection)
+    except ProgrammingError:
+        # The extension does not exist yet; initialize_database() creates it
+        # and then replaces the pooled connections
+        logger.debug("pgvector types not found, skipping registration")
+    finally:
+        dbapi_connection.rollback()
+
+
 # Session factory
 SessionLocal = sessionmaker(
     autocommit=False,
@@ -96,19 +111,56 @@ def initialize_database():
                     user_id TEXT NOT NULL,
                     content TEXT NOT NULL,
                     importance TEXT DEFAULT 'medium',
-                    embedding vector(768),
+                    embedding halfvec(768),
                     created_at TIMESTAMP DEFAULT NOW()
                 );
             """))
 
-            # ANN index
+            # Tables created before halfvec storage still have vector(768);
+            # convert them like alembic revision 5f3a9c1d7e42 does. The old
+            # cosine indexes cannot hold halfvec, so they go first.
+            embedding_type = conn.execute(text("""
+                SELECT format_type(atttypid, atttypmod)
+                FROM pg_attribute
+                WHERE attrelid = 'semantic_memories'::regclass AND attname = 'embedding';
+            """)).scalar()
+            if embedding_type.startswith("vector"):
+                conn.execute(text("DROP INDEX IF EXISTS idx_semantic_memories_embedding;"))
+                conn.execute(text("DROP INDEX IF EXISTS semantic_memories_embedding_hnsw;"))
+                conn.execute(text("""
+                    ALTER TABLE semantic_memories
+                    ALTER COLUMN embedding TYPE halfvec(768) USING embedding::halfvec(768);
+                """))
+
+            # ANN index (HNSW replaces the older ivfflat index). Embeddings are
+            # unit length, so it uses inner product; rows stored before that are
+            # normalized once, when the index is built.
+            conn.execute(text("DROP INDEX IF EXISTS idx_semantic_memories_embedding;"))
+            ip_index = conn.execute(
+                text("SELECT to_regclass('semantic_memories_embedding_hnsw_ip')")
+            ).scalar()
+            if ip_index is None:
+                conn.execute(text("DROP INDEX IF EXISTS semantic_memories_embedding_hnsw;"))
+                conn.execute(text("""
+                    UPDATE semantic_memories
+                    SET embedding = l2_normalize(embedding)
+                    WHERE embedding IS NOT NULL;
+                """))
+                conn.execute(text("""
+                    CREATE INDEX semantic_memories_embedding_hnsw_ip
+                    ON semantic_memories
+                    USING hnsw (embedding halfvec_ip_ops)
+                    WITH (m = 16, ef_construction = 64);
+                """))
+
+            # Per-user lookups and newest-first listing
             conn.execute(text("""
-                CREATE INDEX IF NOT EXISTS idx_semantic_memories_embedding
-                ON semantic_memories
-                USING ivfflat (embedding vector_cosine_ops)
-                WITH (lists = 100);
+                CREATE INDEX IF NOT EXISTS ix_semantic_memories_user_id_created_at
+                ON semantic_memories (user_id, created_at);
             """))
 
+        # Connections opened before the extension existed have no pgvector types
+        engine.dispose()
         logger.info("PostgreSQL database initialized with pgvector + semantic_memories")
     except Exception as e:
         logger.error(f"Failed to initialize database: {e}")
@@ -4,7 +4,6 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
 from fastapi.responses import JSONResponse
 import logging
-import time
 from contextlib import asynccontextmanager
 from core.database import initialize_database
 from core import constants
@@ -12,6 +11,14 @@ from core.exceptions import CustomException
 from api.auth.router import auth_router, get_auth_service
 from api.memories.router import memories_router
 from api.middleware.AuthMiddleware import AuthMiddleware
+from api.middleware.LoggingMiddleware import LoggingMiddleware
+from utils.embeddings import EMBEDDING_PRELOAD, get_embedding_model
+
+logger = logging.getLogger(__name__)
+
+# Before any worker forks, so preforked workers share the loaded weights
+if EMBEDDING_PRELOAD:
+    get_embedding_model()
 
 
 @asynccontextmanager
@@ -19,12 +26,12 @@ async def lifespan(app: FastAPI):
     """Application lifespan events"""
     # Startup
     initialize_database()
-    logging.info("🚀 Application startup complete")
+    logger.info("🚀 Application startup complete")
     
     yield
     
     # Shutdown
-    logging.info("🛑 Application shutdown")
+    logger.info("🛑 Application shutdown")
 
 
 # Initialize FastAPI app
@@ -57,22 +64,7 @@ app.add_middleware(
     ]
 )
 
-@app.middleware("http")
-async def logging_middleware(request: Request, call_next):
-    """Log requests and responses"""
-    start_time = time.time()
-    
-    # Log request
-    logging.info(f"📥 {request.method} {request.url}")
-    
-    response = await call_next(request)
-    
-    # Log response
-    process_time = time.time() - start_time
-    logging.info(f"📤 {request.method} {request.url} - {response.status_code} - {process_time:.4f}s")
-    
-    return response
-
+app.add_middleware(LoggingMiddleware)
 
 app.add_middleware(AuthMiddleware)
 
@@ -80,7 +72,7 @@ app.add_middleware(AuthMiddleware)
 # Exception handler
 @app.exception_handler(CustomException)
 async def custom_exception_handler(request: Request, exc: CustomException):
-    logging.error(f"❌ Custom exception: {exc.message}")
+    logger.error("❌ Custom exception: %s", exc.message)
     return JSONResponse(
         status_code=exc.status_code,
         content={"error": exc.message, "detail": exc.detail}
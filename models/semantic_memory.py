@@ -1,6 +1,6 @@
 import uuid
-from sqlalchemy import Column, String, TIMESTAMP, ForeignKey
-from pgvector.sqlalchemy import Vector
+from sqlalchemy import Column, String, TIMESTAMP, ForeignKey, Index
+from pgvector.sqlalchemy import HALFVEC
 from sqlalchemy.sql import func
 from sqlalchemy.dialects.postgresql import UUID
 from core.database import Base
@@ -19,5 +19,16 @@ class SemanticMemory(Base):
     content = Column(String, nullable=False)
     importance = Column(String, default="medium")
 
-    embedding = Column(Vector(768))  # pgvector column
+    embedding = Column(HALFVEC(768))  # pgvector fp16 column
     created_at = Column(TIMESTAMP, server_default=func.now(), nullable=False)
+
+    __table_args__ = (
+        Index(
+            "semantic_memories_embedding_hnsw_ip",
+            embedding,
+            postgresql_using="hnsw",
+            postgresql_with={"m": 16, "ef_construction": 64},
+            postgresql_ops={"embedding": "halfvec_ip_ops"},
+        ),
+        Index("ix_semantic_memories_user_id_created_at", user_id, created_at),
+    )
@@ -12,9 +12,12 @@ from .web_search import web_search
 from .tool_registry import (
     get_all_tools,
     get_tool_names,
+    invalidate_tool_cache,
     get_tool,
     register_tool,
     unregister_tool,
+    is_speculative_safe,
+    get_prewarm_hook,
     list_available_tools,
     get_tool_info,
     register_default_tools,
@@ -28,9 +31,12 @@ __all__ = [
     # Registry functions
     'get_all_tools',
     'get_tool_names', 
+    'invalidate_tool_cache',
     'get_tool',
     'register_tool',
     'unregister_tool',
+    'is_speculative_safe',
+    'get_prewarm_hook',
     'list_available_tools',
     'get_tool_info',
     'execute_tool',
@@ -1,51 +1,121 @@
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Literal, Annotated, Union, Tuple
 from langchain.tools import BaseTool
 from langchain_core.runnables import RunnableConfig
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, ValidationError, StringConstraints
 import numpy as np
-from sentence_transformers import SentenceTransformer
-from utils.database import getDBConnection
+from pgvector import HalfVector
+from utils.embeddings import get_embedding_model, encode_cached_array, encode_batch_cached
+from utils.database import get_conn, getHNSWParams
 from utils.logger import logger
 from langgraph.runtime import get_runtime
 from dataclasses import dataclass
-import json
+from functools import lru_cache
+from collections import OrderedDict
+import threading
+import time
+
+# Stripped and checked for emptiness in one pass by pydantic-core
+NonEmptyStr = Annotated[str, StringConstraints(strip_whitespace=True, min_length=1)]
 
 class StoreMemoryInput(BaseModel):
     """Input schema for storing memory"""
-    input_data: str = Field(description="JSON string containing: conten and optional importance")
+    content: Union[NonEmptyStr, Annotated[List[NonEmptyStr], Field(min_length=1)]] = Field(
+        description="The important information to store, or a list of separate pieces of it"
+    )
+    importance: Literal["low", "medium", "high"] = Field(default="medium", description="Importance of the memory")
+
+
+class StoreMemoriesBatchInput(BaseModel):
+    """Input schema for storing several memories at once"""
+    memories: List[StoreMemoryInput] = Field(min_length=1, description="Memories to store")
 
 
 class RetrieveMemoryInput(BaseModel):
     """Input schema for retrieving memory"""
-    input_data: str = Field(description="JSON string containing: query, optional top_k, and optional similarity_threshold")
+    query: NonEmptyStr = Field(description="Search query to find relevant memories")
+    top_k: int = Field(default=3, gt=0, description="Number of top results to return")
+    similarity_threshold: float = Field(default=0.7, ge=0.0, le=1.0, description="Minimum similarity threshold")
 
 class UpdateMemoryInput(BaseModel):
     """Input schema for updating memory"""
     memory_id: int = Field(description="ID of the memory to update")
-    new_content: str = Field(description="New content to replace the existing memory")
-    user_id: str = Field(description="User ID who owns this memory")
+    new_content: NonEmptyStr = Field(description="New content to replace the existing memory")
+    user_id: NonEmptyStr = Field(description="User ID who owns this memory")
 
 @dataclass
 class ContextSchema:
     user_id: str
 
+
+def _format_validation_error(error: ValidationError) -> str:
+    """Turn a tool input ValidationError into a message the agent can act on"""
+    details = "; ".join(
+        f"{'.'.join(str(loc) for loc in err['loc']) or 'input'}: {err['msg']}"
+        for err in error.errors()
+    )
+    return f"ERROR: Invalid input - {details}"
+
+
+# Most memories the agent tools store per user (a single store was allowed
+# while the user had at most 10); batches are cut to the slots left
+USER_MEMORY_LIMIT = 11
+
+# Users with at most this many memories are searched in process with NumPy
+IN_MEMORY_SEARCH_LIMIT = 50_000
+
+# Cached memory sets are reloaded after this many seconds, which bounds how
+# long writes made outside these tools (memories API, other workers) go unseen
+USER_CACHE_TTL = 60.0
+
+# Most users whose memory matrices are kept at once
+USER_CACHE_SIZE = 256
+
+# Most memory rows cached across all users (about 3 KB each as float32),
+# so a few large users cannot push the process past its memory budget
+USER_CACHE_MAX_ROWS = 200_000
+
+# A retrieve whose query embedding is at least this similar to an earlier
+# one for the same user (and same top_k/threshold) reuses that result
+SEMANTIC_CACHE_THRESHOLD = 0.95
+
+# Recent retrieve results remembered per user
+SEMANTIC_CACHE_SIZE = 256
+
+def _copy_memories(cursor, rows) -> None:
+    """Stream (user_id, content, embedding, importance) rows in with one binary COPY"""
+    with cursor.copy(
+        "COPY semantic_memories (user_id, content, embedding, importance) "
+        "FROM STDIN (FORMAT BINARY)"
+    ) as copy:
+        copy.set_types(["text", "text", "halfvec", "text"])
+        for user_id, content, embedding, importance in rows:
+            copy.write_row((user_id, content, HalfVector(embedding), importance))
+
 class SemanticMemoryTools:
     def __init__(self):
         """
         Initialize semantic memory tools with Nomic embedding model
         
-        Args:
-            db_connection: PostgreSQL connection with pgvector
+        Queries borrow a connection from the shared PostgreSQL (pgvector)
+        pool through get_conn(), so memory tools running concurrently do not
+        share one socket. The embedding model is loaded on first use, not here.
         """
-        self.db_connection = getDBConnection()
-        
-        # Load Nomic embedding model (768 dimensions, high quality)
-        logger.debug("Loading Nomic embedding model...")
-        self.embedding_model = SentenceTransformer("nomic-ai/nomic-embed-text-v1.5", trust_remote_code=True)
-        logger.debug("Nomic model loaded successfully!")
-        
+        # user_id -> (loaded_at, (N, 768) float32 matrix, row dicts), or
+        # (loaded_at, None, None) for users too large to search in process
+        self.user_cache: "OrderedDict[str, tuple]" = OrderedDict()
+        self._user_cache_lock = threading.Lock()
+        # Rows across all user_cache entries, kept under USER_CACHE_MAX_ROWS
+        self._user_cache_rows = 0
+        # user_id -> (created_at, (M, 768) query embeddings, [((top_k, threshold), result)]);
+        # dropped after USER_CACHE_TTL like user_cache, so outside writes show up
+        self._sem_cache: "OrderedDict[str, tuple]" = OrderedDict()
+    
+    @property
+    def embedding_model(self):
+        """Nomic embedding model (768 dimensions), shared process-wide and loaded lazily"""
+        return get_embedding_model()
         
-    def get_embedding(self, text: str, is_query: bool = False) -> List[float]:
+    def get_embedding(self, text: str, is_query: bool = False) -> np.ndarray:
         """
         Get embedding using Nomic model with appropriate prefixes
         
@@ -60,378 +130,614 @@ class SemanticMemoryTools:
             else:
                 text = f"search_document: {text}"
             
-            embedding = self.embedding_model.encode(text, convert_to_numpy=True)
-            return embedding.tolist()
+            return encode_cached_array(self.embedding_model, text)
         except Exception as e:
             logger.debug(f"Error getting embedding: {e}")
-            return [0.0] * 768  # Nomic is 768 dimensions
-        
-    def _validate_store_memory_input(self, input_data: str) -> tuple[dict, str]:
+            return np.zeros(768, dtype=np.float32)  # Nomic is 768 dimensions
+    
+    def get_embeddings_batch(self, texts: List[str], is_query: bool = False) -> np.ndarray:
         """
-        Validate store memory input and return parsed data or error message
+        Get embeddings for several texts with a single encode() call
         
-        Returns:
-            tuple: (parsed_data_dict, error_message)
-            If error_message is empty, parsed_data_dict contains valid data
+        sentence-transformers sorts a list input by length and pads each batch
+        only to its longest text, so this is much cheaper than embedding the
+        texts one by one. Texts embedded before are served from the cache.
+        
+        Args:
+            texts: Texts to embed
+            is_query: If True, adds search_query prefix; else search_document prefix
         """
+        prefix = "search_query: " if is_query else "search_document: "
         try:
-            data = json.loads(input_data)
-        except json.JSONDecodeError:
-            return {}, "ERROR: Invalid JSON format. Please provide input as: {\"content\": \"your text\", \"importance\": \"medium\"}"
-
-        # Validate required fields
-        if "content" not in data:
-            return {}, "ERROR: Missing required field 'content'. Please provide: {\"content\": \"your text\"}"
-
-        
-        # Extract and validate fields
-        content = data["content"]
-        importance = data.get("importance", "medium")
-        
-        # Validate importance level
-        if importance not in ["low", "medium", "high"]:
-            return {}, "ERROR: Invalid importance level. Must be 'low', 'medium', or 'high'"
-        
-        # Validate content is not empty
-        if not content.strip():
-            return {}, "ERROR: Content cannot be empty"
-        
+            return encode_batch_cached(
+                self.embedding_model,
+                [f"{prefix}{text}" for text in texts],
+                batch_size=32,
+                show_progress_bar=False
+            )
+        except Exception as e:
+            logger.debug(f"Error getting embeddings: {e}")
+            return np.zeros((len(texts), 768), dtype=np.float32)
         
-        return {
-            "content": content.strip(),
-            "importance": importance
-        }, ""
-    
-    def _validate_retrieve_memory_input(self, input_data: str) -> tuple[dict, str]:
+    def store_memories(self, user_id: str, items: List[dict]) -> str:
         """
-        Validate retrieve memory input and return parsed data or error message
+        Embed and store one or more validated memories for a user
         
-        Returns:
-            tuple: (parsed_data_dict, error_message)
-            If error_message is empty, parsed_data_dict contains valid data
+        All contents are embedded with one encode() call. A single memory is
+        inserted with a plain INSERT; several are streamed in with binary COPY,
+        which avoids per-row statement overhead. Embeddings go over the wire
+        in pgvector's binary halfvec format rather than as float text.
+        A user is never taken past USER_MEMORY_LIMIT: items beyond the slots
+        left are discarded, and the returned message says so.
+        
+        Args:
+            user_id: Owner of the memories
+            items: Dicts with "content" and "importance"
         """
         try:
-            data = json.loads(input_data)
-        except json.JSONDecodeError:
-            return {}, "ERROR: Invalid JSON format. Please provide input as: {\"query\": \"search text\"}"
+            embeddings = self.get_embeddings_batch(
+                [item["content"] for item in items], is_query=False
+            )
+            # The index and every search assume unit-length embeddings; the
+            # all-zero fallback from a failed encode would never match anything
+            if not embeddings.any(axis=1).all():
+                return "Error storing memory: could not embed the content"
 
-        
-        # Validate required fields
-        if "query" not in data:
-            return {}, "ERROR: Missing required field 'query'. Please provide: {\"query\": \"search text\"}"
-        
+            with get_conn() as conn:
+                # --- helper to count memories ---
+                def get_memory_count(uid: str) -> int:
+                    with conn.cursor() as cursor:
+                        cursor.execute(
+                            """SELECT COUNT(*) FROM semantic_memories WHERE user_id = %s""",
+                            (uid,)
+                        )
+                        return cursor.fetchall()[0]['count']
 
-        # Extract and validate fields
-        query = data["query"]
-        top_k = data.get("top_k", 3)
-        similarity_threshold = data.get("similarity_threshold", 0.7)
-        
-        # Validate query is not empty
-        if not str(query).strip():
-            return {}, "ERROR: Query cannot be empty"
+                memory_count = get_memory_count(user_id)
+                logger.debug(f"User {user_id} has {memory_count} stored memories.")
+
+                remaining = USER_MEMORY_LIMIT - memory_count
+                dropped = max(len(items) - max(remaining, 0), 0)
+                if remaining > 0:
+                    # Only as many as the limit still allows
+                    items = items[:remaining]
+                    embeddings = embeddings[:remaining]
+                    with conn.cursor() as cursor:
+                        if len(items) == 1:
+                            cursor.execute("""
+                                INSERT INTO semantic_memories (user_id, content, embedding, importance)
+                                VALUES (%s, %s, %b, %s)
+                            """, (user_id, items[0]["content"], HalfVector(embeddings[0]), items[0]["importance"]))
+                        else:
+                            _copy_memories(cursor, (
+                                (user_id, item["content"], embedding, item["importance"])
+                                for item, embedding in zip(items, embeddings)
+                            ))
+
+            if remaining > 0:
+                logger.debug(f"Stored {len(items)} memories for user {user_id}")
+                if dropped:
+                    return (
+                        f"⚠️ Memory limit reached: saved the first {len(items)} memories and "
+                        f"discarded the other {dropped}. Continue the conversation in a natural way "
+                        "without letting the user know."
+                    )
+                return (
+                    "Saved Semantic Info. Continue the conversation in a natural way "
+                    "without letting the user know that you saved anything."
+                )
+
+            # if limit exceeded
+            return (
+                "⚠️ Memory limit reached: The system has already stored the maximum number of memories. "
+                "Continue the conversation in a natural way without letting the user know."
+            )
+
+        except Exception as e:
+            logger.debug(f"Error storing memory: {repr(e)}")
+            return f"Error storing memory: {str(e)}"
+        finally:
+            self.invalidate_user_cache(user_id)
+
+    def store_bulk(self, items: List[Tuple[str, str, str]], chunk_size: int = 1000) -> int:
+        """
+        Embed and store memories for any number of users, for ingestion and backfills
         
-        # Validate top_k is positive integer
-        try:
-            top_k = int(top_k)
-            if top_k <= 0:
-                return {}, "ERROR: top_k must be a positive integer"
-        except (ValueError, TypeError):
-            return {}, "ERROR: top_k must be a valid integer"
+        Items are embedded chunk_size at a time with one encode() call per
+        chunk, and each chunk is streamed in with a single binary COPY. The
+        per-user memory limit of store_memories does not apply.
         
-        # Validate similarity_threshold is between 0 and 1
+        Args:
+            items: (user_id, content, importance) tuples
+            chunk_size: Rows embedded and copied per round
+            
+        Returns:
+            Number of memories stored
+        """
+        stored = 0
         try:
-            similarity_threshold = float(similarity_threshold)
-            if not 0.0 <= similarity_threshold <= 1.0:
-                return {}, "ERROR: similarity_threshold must be between 0.0 and 1.0"
-        except (ValueError, TypeError):
-            return {}, "ERROR: similarity_threshold must be a valid number"
-        
-        logger.debug(f"RetrieveMemoryInput validated: query='{query}', top_k={top_k}, similarity_threshold={similarity_threshold}")
-        
-        return {
-            "query": str(query).strip(),
-            "top_k": top_k,
-            "similarity_threshold": similarity_threshold
-        }, ""
+            with get_conn() as conn, conn.transaction(), conn.cursor() as cursor:
+                for start in range(0, len(items), chunk_size):
+                    chunk = items[start:start + chunk_size]
+                    embeddings = self.get_embeddings_batch([content for _, content, _ in chunk], is_query=False)
+                    if not embeddings.any(axis=1).all():
+                        raise ValueError("could not embed the content")
+                    _copy_memories(cursor, (
+                        (user_id, content, embedding, importance)
+                        for (user_id, content, importance), embedding in zip(chunk, embeddings)
+                    ))
+                    stored += len(chunk)
+            logger.debug(f"Bulk stored {stored} memories")
+            return stored
+        finally:
+            for user_id in {user_id for user_id, _, _ in items}:
+                self.invalidate_user_cache(user_id)
+
+    def invalidate_user_cache(self, user_id: str) -> None:
+        """Drop a user's cached memory matrix and retrieve results so the next search reloads them"""
+        with self._user_cache_lock:
+            self._drop_user_entry(user_id)
+            self._sem_cache.pop(user_id, None)
 
-    def _validate_update_memory_input(self, input_data: dict) -> tuple[dict, str]:
+    def _drop_user_entry(self, user_id: str) -> None:
+        """Remove a user's memory matrix from user_cache; the caller holds _user_cache_lock"""
+        entry = self.user_cache.pop(user_id, None)
+        if entry is not None and entry[2] is not None:
+            self._user_cache_rows -= len(entry[2])
+
+    def _cache_user_entry(self, user_id: str, entry: tuple) -> None:
+        """Store a user's memory matrix, evicting the least recently used past the size and row limits"""
+        with self._user_cache_lock:
+            self._drop_user_entry(user_id)
+            self.user_cache[user_id] = entry
+            if entry[2] is not None:
+                self._user_cache_rows += len(entry[2])
+            while len(self.user_cache) > 1 and (
+                len(self.user_cache) > USER_CACHE_SIZE or self._user_cache_rows > USER_CACHE_MAX_ROWS
+            ):
+                self._drop_user_entry(next(iter(self.user_cache)))
+
+    def get_cached_result(self, user_id: str, query_embedding: np.ndarray, params: tuple) -> Optional[str]:
         """
-        Validate update memory input and return parsed data or error message
+        Find an earlier retrieve result for a near-identical query
         
+        Args:
+            user_id: Owner of the memories
+            query_embedding: Normalized query embedding
+            params: (top_k, similarity_threshold) the result must have been made with
+            
         Returns:
-            tuple: (parsed_data_dict, error_message)
-            If error_message is empty, parsed_data_dict contains valid data
+            The cached result, or None on a miss
         """
-        data = input_data
-        
-        # Validate required fields
-        if "memory_id" not in data:
-            return {}, "ERROR: Missing required field 'memory_id'. Please provide: {\"memory_id\": 123, \"new_content\": \"text\", \"user_id\": \"user_id\"}"
-        
-        if "new_content" not in data:
-            return {}, "ERROR: Missing required field 'new_content'. Please provide: {\"memory_id\": 123, \"new_content\": \"text\", \"user_id\": \"user_id\"}"
+        with self._user_cache_lock:
+            entry = self._sem_cache.get(user_id)
+            if entry is not None and time.monotonic() - entry[0] > USER_CACHE_TTL:
+                del self._sem_cache[user_id]
+                entry = None
+        if entry is None:
+            return None
+
+        _, queries, results = entry
+        similarities = queries @ query_embedding
+        for i in np.argsort(-similarities):
+            if similarities[i] < SEMANTIC_CACHE_THRESHOLD:
+                break
+            if results[i][0] == params:
+                return results[i][1]
+        return None
+
+    def cache_result(self, user_id: str, query_embedding: np.ndarray, params: tuple, result: str) -> None:
+        """
+        Remember a retrieve result, dropping the user's oldest once SEMANTIC_CACHE_SIZE is reached
         
-        if "user_id" not in data:
-            return {}, "ERROR: Missing required field 'user_id'. Please provide: {\"memory_id\": 123, \"new_content\": \"text\", \"user_id\": \"user_id\"}"
+        A user's results are all dropped USER_CACHE_TTL seconds after the
+        first one was cached, so none is older than a cached memory matrix.
+        """
+        now = time.monotonic()
+        with self._user_cache_lock:
+            entry = self._sem_cache.get(user_id)
+            if entry is None or now - entry[0] > USER_CACHE_TTL:
+                entry = (now, np.empty((0, 768), dtype=np.float32), [])
+            created_at, queries, results = entry
+            queries = np.vstack([queries[-(SEMANTIC_CACHE_SIZE - 1):], query_embedding[np.newaxis]])
+            results = results[-(SEMANTIC_CACHE_SIZE - 1):] + [(params, result)]
+            self._sem_cache[user_id] = (created_at, queries, results)
+            self._sem_cache.move_to_end(user_id)
+            while len(self._sem_cache) > USER_CACHE_SIZE:
+                self._sem_cache.popitem(last=False)
+
+    def _load_user_memories(self, user_id: str) -> tuple:
+        """
+        Fetch a user's memories and embeddings into a cache entry
         
-        # Extract and validate fields
-        memory_id = data["memory_id"]
-        new_content = data["new_content"]
-        user_id = data["user_id"]
+        The rows are counted first (stopping past IN_MEMORY_SEARCH_LIMIT), so
+        a user too large to search in process costs one count query per
+        USER_CACHE_TTL instead of a transfer of every embedding.
+        """
+        with get_conn() as conn, conn.cursor() as cursor:
+            cursor.execute("""
+                SELECT count(*) AS row_count FROM (
+                    SELECT 1 FROM semantic_memories
+                    WHERE user_id = %s AND embedding IS NOT NULL
+                    LIMIT %s
+                ) AS limited
+            """, (user_id, IN_MEMORY_SEARCH_LIMIT + 1))
+            if cursor.fetchone()["row_count"] > IN_MEMORY_SEARCH_LIMIT:
+                return (time.monotonic(), None, None)
+
+            cursor.execute("""
+                SELECT id, content, importance, created_at, embedding
+                FROM semantic_memories
+                WHERE user_id = %s AND embedding IS NOT NULL
+                LIMIT %s
+            """, (user_id, IN_MEMORY_SEARCH_LIMIT))
+            rows = cursor.fetchall()
+
+        matrix = np.empty((len(rows), 768), dtype=np.float32)
+        for i, row in enumerate(rows):
+            matrix[i] = row.pop("embedding").to_numpy()
+        return (time.monotonic(), matrix, rows)
+
+    def explain_search(self, user_id: str, query: str, top_k: int = 3, similarity_threshold: float = 0.7) -> str:
+        """
+        Run the retrieve query under EXPLAIN ANALYZE and return the plan
         
-        # Validate memory_id is positive integer
-        try:
-            memory_id = int(memory_id)
-            if memory_id <= 0:
-                return {}, "ERROR: memory_id must be a positive integer"
-        except (ValueError, TypeError):
-            return {}, "ERROR: memory_id must be a valid integer"
+        Debugging aid for checking that PostgreSQL answers the search with
+        an index scan on semantic_memories_embedding_hnsw_ip rather than a
+        sequential scan. Uses the same settings and SQL as retrieve_memory.
         
-        # Validate new_content is not empty
-        if not str(new_content).strip():
-            return {}, "ERROR: New content cannot be empty"
+        Args:
+            user_id: Owner of the memories
+            query: Search query
+            top_k: Number of top results to return
+            similarity_threshold: Minimum similarity threshold
+        """
+        query_embedding = self.get_embedding(query, is_query=True)
+        
+        with get_conn() as conn, conn.transaction(), conn.cursor() as cursor:
+            _apply_hnsw_settings(cursor, top_k)
+            cursor.execute("EXPLAIN (ANALYZE, BUFFERS) " + _RETRIEVE_MEMORIES_SQL, {
+                "embedding": HalfVector(query_embedding),
+                "user_id": user_id,
+                "max_distance": -similarity_threshold,
+                "top_k": top_k
+            })
+            plan = "\n".join(row["QUERY PLAN"] for row in cursor.fetchall())
+        
+        if "semantic_memories_embedding_hnsw_ip" not in plan:
+            logger.debug("Memory search is not using the HNSW index:\n{}", plan)
+        return plan
+
+    def search_in_memory(
+        self, user_id: str, query_embedding: np.ndarray, top_k: int, similarity_threshold: float
+    ) -> Optional[List[dict]]:
+        """
+        Search a user's memories in process instead of through the HNSW index
         
-        # Validate user_id is not empty
-        if not str(user_id).strip():
-            return {}, "ERROR: User ID cannot be empty"
+        The user's embeddings are cached as one float32 matrix, so a search is
+        a single BLAS matrix-vector product plus a partial sort. Embeddings
+        are unit length, so the dot product is the cosine similarity.
         
-        return {
-            "memory_id": memory_id,
-            "new_content": str(new_content).strip(),
-            "user_id": str(user_id).strip()
-        }, ""
+        Args:
+            user_id: Owner of the memories
+            query_embedding: Normalized query embedding
+            top_k: Number of top results to return
+            similarity_threshold: Minimum similarity threshold
+            
+        Returns:
+            Matching rows, most similar first, or None if the user has too
+            many memories and the search should go to PostgreSQL
+        """
+        with self._user_cache_lock:
+            entry = self.user_cache.get(user_id)
+            if entry is not None:
+                self.user_cache.move_to_end(user_id)
+
+        if entry is None or time.monotonic() - entry[0] > USER_CACHE_TTL:
+            entry = self._load_user_memories(user_id)
+            self._cache_user_entry(user_id, entry)
+
+        _, matrix, rows = entry
+        if matrix is None:
+            return None
+        if not rows:
+            return []
+
+        similarities = matrix @ query_embedding
+        if top_k < len(rows):
+            candidates = np.argpartition(-similarities, top_k - 1)[:top_k]
+        else:
+            candidates = np.arange(len(rows))
+        candidates = candidates[similarities[candidates] > similarity_threshold]
+        candidates = candidates[np.argsort(-similarities[candidates])]
+
+        return [
+            {**rows[i], "similarity": float(similarities[i])}
+            for i in candidates
+        ]
     
     def create_store_memory_tool(self) -> BaseTool:
         """Create tool for storing memories"""
+        return StoreMemoryTool(memory_tools=self)
 
-        memory_tools = self  # capture self in closure        
-        class StoreMemoryTool(BaseTool):
-            name: str = "store_memory"
-            description: str = """Store important information in long-term semantic memory.
-
-            Criteria for "STORE":
-            - Facts about the user's **identity** (name, age, role, location, background).
-            - The user's **skills, knowledge, or what they are learning**.
-            - The user's **preferences** (likes, dislikes, goals, interests, tools they use).
-            - Important **projects, work, or studies** the user is doing.
-            - Facts the user explicitly asks the assistant to "remember".
-
-            Criteria for "IGNORE":
-            - Temporary context (meals, current location, mood, weather, casual chit-chat).
-            - Time-bound information that won't be relevant in the future.
-            - Assistant's own responses (do not store model outputs).
-            - Duplicate information already known.
-            
-            Input format: Provide a JSON string with these fields:
-            {
-                "content": "The important information to store",
-                "importance": "low|medium|high (optional, defaults to medium)"
-            }
-            
-            Example: {"content": "User prefers coffee over tea", "importance": "medium"}
-            """
-            args_schema: type[BaseModel] = StoreMemoryInput
-            
-            def _run(self, input_data: str) -> str:
-                runtime = get_runtime(ContextSchema)
-                user_id = runtime.context['user_id']
-
-                # Validate input
-                parsed_data, error_msg = memory_tools._validate_store_memory_input(input_data)
-                if error_msg:
-                    return error_msg
-                
-                try:
-                    embedding = memory_tools.get_embedding(
-                        parsed_data["content"], is_query=False
-                    )
+    def create_store_memories_batch_tool(self) -> BaseTool:
+        """Create tool for storing several memories at once"""
+        return StoreMemoriesBatchTool(memory_tools=self)
 
-                    # --- helper to count memories ---
-                    def get_memory_count(uid: str) -> int:
-                        with memory_tools.db_connection.cursor() as cursor:
-                            cursor.execute(
-                                """SELECT COUNT(*) FROM semantic_memories WHERE user_id = %s""",
-                                (uid,)
-                            )
-                            return cursor.fetchall()[0]['count']
-
-                    memory_count = get_memory_count(user_id)
-                    logger.debug(f"User {user_id} has {memory_count} stored memories.")
-
-                    if memory_count <= 10:
-                        # safe to insert
-                        with memory_tools.db_connection.cursor() as cursor:
-                            cursor.execute("""
-                                INSERT INTO semantic_memories (user_id, content, embedding, importance)
-                                VALUES (%s, %s, %s, %s)
-                                RETURNING id
-                            """, (
-                                user_id,
-                                parsed_data["content"],
-                                embedding,
-                                parsed_data["importance"]
-                            ))
-                            memory_id = cursor.fetchone()['id']
-                            memory_tools.db_connection.commit()
+    def create_retrieve_memory_tool(self) -> BaseTool:
+        """Create tool for retrieving similar memories"""
+        return RetrieveMemoryTool(memory_tools=self)
 
-                        logger.debug(f"Stored memory {memory_id} for user {user_id}")
-                        return (
-                            "Saved Semantic Info. Continue the conversation in a natural way "
-                            "without letting the user know that you saved anything."
-                        )
+    def create_update_memory_tool(self) -> BaseTool:
+        """Create tool for updating existing memories"""
+        return UpdateMemoryTool(memory_tools=self)
 
-                    # if limit exceeded
-                    return (
-                        "⚠️ Memory limit reached: The system has already stored the maximum number of memories. "
-                        "Continue the conversation in a natural way without letting the user know."
-                    )
 
-                except Exception as e:
-                    logger.debug(f"Error storing memory: {repr(e)}")
-                    memory_tools.db_connection.rollback()
-                    return f"Error storing memory: {str(e)}"
-        
-        return StoreMemoryTool()
+class StoreMemoryTool(BaseTool):
+    name: str = "store_memory"
+    description: str = """Store important information in long-term semantic memory.
 
-    
-    def create_retrieve_memory_tool(self) -> BaseTool:
-        """Create tool for retrieving similar memories"""
-        
-        # Capture self in closure
-        memory_tools = self
-        
-        class RetrieveMemoryTool(BaseTool):
-            name: str = "retrieve_memory"
-            description: str = """Search and retrieve relevant information & user preferences from long-term semantic memory.
+    Criteria for "STORE":
+    - Facts about the user's **identity** (name, age, role, location, background).
+    - The user's **skills, knowledge, or what they are learning**.
+    - The user's **preferences** (likes, dislikes, goals, interests, tools they use).
+    - Important **projects, work, or studies** the user is doing.
+    - Facts the user explicitly asks the assistant to "remember".
 
-            Parameters:
-            - query (str): Search query to find relevant memories
-            - top_k (int, optional): Number of top results to return (default: 3)
-            - similarity_threshold (float, optional): Minimum similarity threshold 0.0-1.0 (default: 0.7)
+    Criteria for "IGNORE":
+    - Temporary context (meals, current location, mood, weather, casual chit-chat).
+    - Time-bound information that won't be relevant in the future.
+    - Assistant's own responses (do not store model outputs).
+    - Duplicate information already known.
 
-            Example: {"query": "search text", "top_k":"2", "similarity_threshold":"0.8"}
-            
-            Use when:
-            - You need context about the user's preferences or history
-            - The conversation touches on topics discussed before
-            - You want to check if you have relevant stored information
-            - Building upon previous conversations or decisions"""
-            args_schema: type[BaseModel] = RetrieveMemoryInput
-            
-            def _run(self, input_data: str) -> str:
-                
-                runtime = get_runtime(ContextSchema)
-                user_id= runtime.context['user_id']
-
-                logger.debug("HEEREREREREREREERER")
-
-                # Validate input using separate validation function
-                parsed_data, error_msg = memory_tools._validate_retrieve_memory_input(input_data)
-                if error_msg:
-                    return error_msg
-                logger.debug(user_id,parsed_data,"-------")
-                
-                try:
-                    query_embedding = memory_tools.get_embedding(parsed_data["query"], is_query=True)
-
-                    
-                    with memory_tools.db_connection.cursor() as cursor:
-                        cursor.execute("""
-                            SELECT 
-                                id,
-                                content,
-                                importance,
-                                created_at,
-                                1 - (embedding <=> %s::vector) as similarity
-                            FROM semantic_memories
-                            WHERE user_id = %s
-                            AND 1 - (embedding <=> %s::vector) > %s
-                            ORDER BY similarity DESC
-                            LIMIT %s
-                        """, (query_embedding, user_id, query_embedding, parsed_data["similarity_threshold"], parsed_data["top_k"]))
-                        
-                        results = cursor.fetchall()
-                        
-                        logger.debug(results,"-------")
-                    
-                    if not results:
-                        logger.debug(f"No relevant memories found for query: {parsed_data['query']}")
-                        return f"No relevant memories found for query: {parsed_data['query']}"
-                    
-                    formatted_results = "Retrieved memories:\n"
-                    for i, row in enumerate(results, 1):
-                        formatted_results += f"{i}. [ID: {row['id']}, Similarity: {round(row['similarity'], 3)}, {row['importance']} importance]\n"
-                        formatted_results += f"   Content: {row['content']}\n"
-                        formatted_results += f"   Stored: {row['created_at'].strftime('%Y-%m-%d %H:%M')}\n\n"
-                    
-                    logger.debug("----------------",formatted_results,"--------------")
-                    return formatted_results
-                    
-                except Exception as e:
-                    logger.debug(f"Error retrieving memories: {str(e)} {(e)}")
-                    memory_tools.db_connection.rollback()
-                    return f"Error retrieving memories: {str(e)}"
-        
-        return RetrieveMemoryTool()
+    Input format: Provide a JSON object with these fields:
+    {
+        "content": "The important information to store",
+        "importance": "low|medium|high (optional, defaults to medium)"
+    }
+
+    Example: {"content": "User prefers coffee over tea", "importance": "medium"}
+
+    Several facts with the same importance can be stored in one call by
+    passing a list: {"content": ["User is learning Rust", "User lives in Lahore"]}
+    """
+    args_schema: type[BaseModel] = StoreMemoryInput
+    memory_tools: SemanticMemoryTools
+    handle_validation_error: Any = _format_validation_error
+
+    def _run(self, content: Union[str, List[str]], importance: str = "medium") -> str:
+        runtime = get_runtime(ContextSchema)
+        user_id = runtime.context['user_id']
+
+        # A list goes through the same single encode() and COPY as the batch tool
+        contents = content if isinstance(content, list) else [content]
+        return self.memory_tools.store_memories(
+            user_id, [{"content": item, "importance": importance} for item in contents]
+        )
+
+
+class StoreMemoriesBatchTool(BaseTool):
+    name: str = "store_memories_batch"
+    description: str = """Store several pieces of important information in long-term semantic memory at once.
+
+    Use this instead of calling store_memory repeatedly when the user shares
+    multiple facts worth remembering. The same criteria as store_memory apply.
+
+    Input format: Provide a JSON object with a "memories" list:
+    {
+        "memories": [
+            {"content": "The important information to store", "importance": "low|medium|high (optional)"}
+        ]
+    }
+
+    Example: {"memories": [{"content": "User is learning Rust"}, {"content": "User lives in Lahore", "importance": "high"}]}
+    """
+    args_schema: type[BaseModel] = StoreMemoriesBatchInput
+    memory_tools: SemanticMemoryTools
+    handle_validation_error: Any = _format_validation_error
+
+    def _run(self, memories: List[StoreMemoryInput]) -> str:
+        runtime = get_runtime(ContextSchema)
+        user_id = runtime.context['user_id']
+
+        return self.memory_tools.store_memories(
+            user_id,
+            [
+                {"content": content, "importance": memory.importance}
+                for memory in memories
+                for content in (memory.content if isinstance(memory.content, list) else [memory.content])
+            ]
+        )
+
+
+def _apply_hnsw_settings(cursor, top_k: int) -> None:
+    """Set the HNSW search parameters for the cursor's current transaction"""
+    # Transaction-local, like SET LOCAL. Iterative scans (pgvector >= 0.8) keep
+    # the HNSW index from returning too few rows once the user_id filter is
+    # applied. ef_search is sized to the table and never below top_k, or the
+    # scan could return fewer rows than asked for; max_scan_tuples lets the
+    # scan look further for a user whose rows are sparse in the shared graph.
+    hnsw_params = getHNSWParams()
+    cursor.execute(
+        "SELECT set_config('hnsw.ef_search', %s, true), set_config('hnsw.max_scan_tuples', %s, true)",
+        (str(max(hnsw_params["ef_search"], top_k)), str(hnsw_params["max_scan_tuples"]))
+    )
+    cursor.execute("SET LOCAL hnsw.iterative_scan = relaxed_order")
+
+
+# Kept as one constant so each pooled connection prepares it once and
+# later retrieves skip the server-side parse and plan
+_RETRIEVE_MEMORIES_SQL = """
+    WITH candidates AS MATERIALIZED (
+        SELECT
+            id,
+            content,
+            importance,
+            created_at,
+            embedding <#> %(embedding)b AS distance
+        FROM semantic_memories
+        WHERE user_id = %(user_id)s
+        ORDER BY distance
+        LIMIT %(top_k)s
+    )
+    SELECT id, content, importance, created_at, -distance AS similarity
+    FROM candidates
+    WHERE distance < %(max_distance)s
+    ORDER BY distance
+"""
+
+
+class RetrieveMemoryTool(BaseTool):
+    name: str = "retrieve_memory"
+    description: str = """Search and retrieve relevant information & user preferences from long-term semantic memory.
+
+    Parameters:
+    - query (str): Search query to find relevant memories
+    - top_k (int, optional): Number of top results to return (default: 3)
+    - similarity_threshold (float, optional): Minimum similarity threshold 0.0-1.0 (default: 0.7)
+
+    Example: {"query": "search text", "top_k":"2", "similarity_threshold":"0.8"}
+
+    Use when:
+    - You need context about the user's preferences or history
+    - The conversation touches on topics discussed before
+    - You want to check if you have relevant stored information
+    - Building upon previous conversations or decisions"""
+    args_schema: type[BaseModel] = RetrieveMemoryInput
+    memory_tools: SemanticMemoryTools
+    handle_validation_error: Any = _format_validation_error
+
+    def _run(self, query: str, top_k: int = 3, similarity_threshold: float = 0.7) -> str:
+
+        runtime = get_runtime(ContextSchema)
+        user_id= runtime.context['user_id']
+
+        parsed_data = {
+            "query": query,
+            "top_k": top_k,
+            "similarity_threshold": similarity_threshold
+        }
+        logger.debug("Retrieving memories for {}: {}", user_id, parsed_data)
+
+        # Unit-length embeddings never exceed a cosine similarity of 1.0, so
+        # these requests cannot match anything; skip the embedding and the query
+        if top_k <= 0 or similarity_threshold >= 1.0:
+            return f"No relevant memories found for query: {query}"
+
+        try:
+            query_embedding = self.memory_tools.get_embedding(parsed_data["query"], is_query=True)
+
+            # Follow-up questions often repeat an earlier query almost verbatim
+            cache_params = (parsed_data["top_k"], parsed_data["similarity_threshold"])
+            cached = self.memory_tools.get_cached_result(user_id, query_embedding, cache_params)
+            if cached is not None:
+                return cached
+
+            results = self.memory_tools.search_in_memory(
+                user_id, query_embedding, parsed_data["top_k"], parsed_data["similarity_threshold"]
+            )
+
+            # Too many memories to search in process; use the HNSW index
+            if results is None:
+                with get_conn() as conn, conn.transaction(), conn.cursor() as cursor:
+                    _apply_hnsw_settings(cursor, parsed_data["top_k"])
+                    # Ordering by the bare distance lets the planner use the HNSW
+                    # index; the outer query restores exact order after the relaxed scan.
+                    # Embeddings are unit length, so <#> (negative inner product) is
+                    # minus the cosine similarity. The distance is computed once per
+                    # row; since candidates are nearest-first, applying the threshold
+                    # after the LIMIT keeps exactly the rows that pass it.
+                    cursor.execute(_RETRIEVE_MEMORIES_SQL, {
+                        "embedding": HalfVector(query_embedding),
+                        "user_id": user_id,
+                        "max_distance": -parsed_data["similarity_threshold"],
+                        "top_k": parsed_data["top_k"]
+                    }, prepare=True)
+
+                    results = cursor.fetchall()
+
+                    logger.debug("Retrieved rows: {}", results)
+
+            if not results:
+                logger.debug(f"No relevant memories found for query: {parsed_data['query']}")
+                return f"No relevant memories found for query: {parsed_data['query']}"
+
+            # Built as one join rather than repeated += on a growing string
+            formatted_results = "Retrieved memories:\n" + "".join(
+                f"{i}. [ID: {row['id']}, Similarity: {round(row['similarity'], 3)}, {row['importance']} importance]\n"
+                f"   Content: {row['content']}\n"
+                f"   Stored: {row['created_at']:%Y-%m-%d %H:%M}\n\n"
+                for i, row in enumerate(results, 1)
+            )
+
+            logger.debug("Formatted memories:\n{}", formatted_results)
+            self.memory_tools.cache_result(user_id, query_embedding, cache_params, formatted_results)
+            return formatted_results
+
+        except Exception as e:
+            logger.debug(f"Error retrieving memories: {str(e)} {(e)}")
+            return f"Error retrieving memories: {str(e)}"
+
+
+class UpdateMemoryTool(BaseTool):
+    name: str = "update_memory"
+    description: str = """Update an existing memory with new information.
+
+    Parameters:
+    - memory_id (int): ID of the memory to update (get this from retrieve_memory results)
+    - new_content (str): New content to replace the existing memory
+    - user_id (str): User ID who owns this memory
+
+    Use this when you need to modify or correct previously stored information.
+    Always retrieve memories first to get the correct memory_id."""
+    args_schema: type[BaseModel] = UpdateMemoryInput
+    memory_tools: SemanticMemoryTools
+
+    def _run(self, memory_id: int, new_content: str, user_id: str) -> str:
+        try:
+            new_embedding = self.memory_tools.get_embedding(new_content, is_query=False)
+            # Same refusal as store_memories: the zero fallback would score 0 against every query
+            if not new_embedding.any():
+                return "Error updating memory: could not embed the content"
+
+            with get_conn() as conn, conn.cursor() as cursor:
+                cursor.execute("""
+                    UPDATE semantic_memories 
+                    SET content = %s, embedding = %b, created_at = NOW()
+                    WHERE id = %s AND user_id = %s
+                    RETURNING id
+                """, (new_content, HalfVector(new_embedding), memory_id, user_id))
+
+                result = cursor.fetchone()
+
+                if result:
+                    self.memory_tools.invalidate_user_cache(user_id)
+                    return f"Memory {memory_id} updated successfully with new content: '{new_content[:100]}...'"
+                else:
+                    return f"Memory {memory_id} not found or access denied"
+
+        except Exception as e:
+            return f"Error updating memory: {str(e)}"
+
+
+@lru_cache(maxsize=1)
+def get_semantic_memory_tools() -> SemanticMemoryTools:
+    """Get the shared SemanticMemoryTools instance"""
+    return SemanticMemoryTools()
 
-    def create_update_memory_tool(self) -> BaseTool:
-        """Create tool for updating existing memories"""
-        
-        # Capture self in closure
-        memory_tools = self
-        
-        class UpdateMemoryTool(BaseTool):
-            name: str = "update_memory"
-            description: str = """Update an existing memory with new information.
-            
-            Parameters:
-            - memory_id (int): ID of the memory to update (get this from retrieve_memory results)
-            - new_content (str): New content to replace the existing memory
-            - user_id (str): User ID who owns this memory
-            
-            Use this when you need to modify or correct previously stored information.
-            Always retrieve memories first to get the correct memory_id."""
-            args_schema: type[BaseModel] = UpdateMemoryInput
-            
-            def _run(self, memory_id: int, new_content: str, user_id: str) -> str:
-                try:
-                    new_embedding = memory_tools.get_embedding(new_content, is_query=False)
-                    
-                    with memory_tools.db_connection.cursor() as cursor:
-                        cursor.execute("""
-                            UPDATE semantic_memories 
-                            SET content = %s, embedding = %s, created_at = NOW()
-                            WHERE id = %s AND user_id = %s
-                            RETURNING id
-                        """, (new_content, new_embedding, memory_id, user_id))
-                        
-                        result = cursor.fetchone()
-                        memory_tools.db_connection.commit()
-                        
-                        if result:
-                            return f"Memory {memory_id} updated successfully with new content: '{new_content[:100]}...'"
-                        else:
-                            return f"Memory {memory_id} not found or access denied"
-                    
-                except Exception as e:
-                    return f"Error updating memory: {str(e)}"
-        
-        return UpdateMemoryTool()
 
 def create_memory_tools() -> List[BaseTool]:
     """
     Create all memory tools for the agent using Nomic embeddings
-    
-    Args:
-        db_connection: PostgreSQL connection with pgvector
         
     Returns:
-        List of memory tools: [store_memory, retrieve_memory, update_memory]
+        List of memory tools: [store_memory, store_memories_batch, retrieve_memory, update_memory]
     """
-    memory_tools = SemanticMemoryTools()
+    memory_tools = get_semantic_memory_tools()
     
     return [
         memory_tools.create_store_memory_tool(),
+        memory_tools.create_store_memories_batch_tool(),
         memory_tools.create_retrieve_memory_tool(),
         # memory_tools.create_update_memory_tool()
     ]
@@ -3,10 +3,11 @@ Tool registry for managing all available tools in the Customer Support Agent.
 Provides centralized tool management and easy extension capabilities.
 """
 
-from typing import List, Dict, Any
+import orjson
+from typing import List, Dict, Any, Callable, Optional
 from langchain_core.tools import BaseTool
 
-from .web_search import web_search
+from .web_search import web_search, get_firecrawl_app
 from .date_time import get_date_and_time
 from .city_weather import get_weather
 from .memory import create_memory_tools
@@ -19,6 +20,10 @@ class ToolRegistry:
         """Initialize the tool registry."""
         self._tools = {}
         self._tool_descriptions = {}
+        self._speculative_safe = set()
+        self._prewarm_hooks = {}
+        self._tools_cache = None
+        self._tool_names_cache = None
     
     def register_default_tools(self):
         """Register the default set of tools."""
@@ -29,20 +34,47 @@ class ToolRegistry:
 
         # self.get_tool("store_memory").invoke('{"content": "User Saim likes Football", "importance": "medium"}')
         # self.get_tool("retrieve_memory").invoke('{"query": "Yahya Likes Chess", "user_id": "Yahya"}')
-        self.register_tool(web_search, "Web search for finding current information and external facts")
+        self.register_tool(
+            web_search,
+            "Web search for finding current information and external facts",
+            speculative_safe=True,
+            prewarm=get_firecrawl_app
+        )
+        # Not speculative: a result started early would report an earlier time
         self.register_tool(get_date_and_time, "Provides current date and time information")
-        self.register_tool(get_weather, "Provides current weather information in a city")
+        self.register_tool(get_weather, "Provides current weather information in a city", speculative_safe=True)
     
-    def register_tool(self, tool: BaseTool, description: str = None):
+    def register_tool(
+        self,
+        tool: BaseTool,
+        description: str = None,
+        speculative_safe: bool = False,
+        prewarm: Optional[Callable[[], None]] = None
+    ):
         """
         Register a new tool in the registry.
         
         Args:
             tool: The tool to register (must be a LangChain tool)
             description: Optional description of the tool's purpose
+            speculative_safe: Whether the tool is read-only and may be started
+                before the agent step that requested it has finished
+            prewarm: Optional callable that prepares the tool (clients, sessions)
+                ahead of a call
         """
         tool_name = tool.name
         self._tools[tool_name] = tool
+        self.invalidate_cache()
+        
+        if speculative_safe:
+            self._speculative_safe.add(tool_name)
+        else:
+            self._speculative_safe.discard(tool_name)
+        
+        if prewarm:
+            self._prewarm_hooks[tool_name] = prewarm
+        else:
+            self._prewarm_hooks.pop(tool_name, None)
         
         if description:
             self._tool_descriptions[tool_name] = description
@@ -60,6 +92,9 @@ class ToolRegistry:
         """
         if tool_name in self._tools:
             del self._tools[tool_name]
+            self.invalidate_cache()
+            self._speculative_safe.discard(tool_name)
+            self._prewarm_hooks.pop(tool_name, None)
             if tool_name in self._tool_descriptions:
                 del self._tool_descriptions[tool_name]
     
@@ -75,23 +110,62 @@ class ToolRegistry:
         """
         return self._tools.get(tool_name)
     
+    def is_speculative_safe(self, tool_name: str) -> bool:
+        """
+        Check whether a tool may be executed speculatively.
+        
+        Args:
+            tool_name: Name of the tool to check
+            
+        Returns:
+            True if the tool was registered as speculative-safe
+        """
+        return tool_name in self._speculative_safe
+    
+    def get_prewarm_hook(self, tool_name: str) -> Optional[Callable[[], None]]:
+        """
+        Get the prewarm hook registered for a tool.
+        
+        Args:
+            tool_name: Name of the tool
+            
+        Returns:
+            The prewarm callable or None if the tool has none
+        """
+        return self._prewarm_hooks.get(tool_name)
+    
+    def invalidate_cache(self):
+        """Drop the cached tool lists so they are rebuilt on next access."""
+        self._tools_cache = None
+        self._tool_names_cache = None
+    
     def get_all_tools(self) -> List[BaseTool]:
         """
         Get all registered tools.
         
+        The list is built once and reused until the registry changes,
+        so callers must not modify it.
+        
         Returns:
             List of all registered tools
         """
-        return list(self._tools.values())
+        if self._tools_cache is None:
+            self._tools_cache = list(self._tools.values())
+        return self._tools_cache
     
     def get_tool_names(self) -> List[str]:
         """
         Get names of all registered tools.
         
+        The list is built once and reused until the registry changes,
+        so callers must not modify it.
+        
         Returns:
             List of tool names
         """
-        return list(self._tools.keys())
+        if self._tool_names_cache is None:
+            self._tool_names_cache = list(self._tools.keys())
+        return self._tool_names_cache
     
     def get_tool_info(self) -> Dict[str, Dict[str, Any]]:
         """
@@ -161,14 +235,34 @@ def get_tool_names() -> List[str]:
     return _tool_registry.get_tool_names()
 
 
+def invalidate_tool_cache():
+    """Drop the cached tool lists (e.g. after patching the registry in tests)."""
+    _tool_registry.invalidate_cache()
+
+
 def get_tool(tool_name: str) -> BaseTool:
     """Get a specific tool by name."""
     return _tool_registry.get_tool(tool_name)
 
 
-def register_tool(tool: BaseTool, description: str = None):
+def register_tool(
+    tool: BaseTool,
+    description: str = None,
+    speculative_safe: bool = False,
+    prewarm: Optional[Callable[[], None]] = None
+):
     """Register a new tool."""
-    _tool_registry.register_tool(tool, description)
+    _tool_registry.register_tool(tool, description, speculative_safe, prewarm)
+
+
+def is_speculative_safe(tool_name: str) -> bool:
+    """Check whether a tool may be executed speculatively."""
+    return _tool_registry.is_speculative_safe(tool_name)
+
+
+def get_prewarm_hook(tool_name: str) -> Optional[Callable[[], None]]:
+    """Get the prewarm hook registered for a tool, if any."""
+    return _tool_registry.get_prewarm_hook(tool_name)
 
 
 def unregister_tool(tool_name: str):
@@ -201,4 +295,14 @@ def execute_tool(tool_name: str, tool_args: Dict[str, Any]) -> Any:
     if not tool:
         raise ValueError(f"Tool '{tool_name}' not found in registry.")
     
+    # ReAct actions carry their input as text; a JSON object is handed to the
+    # tool as keyword arguments so its args_schema validates each field
+    if isinstance(tool_args, str) and tool_args.lstrip().startswith("{"):
+        try:
+            parsed_args = orjson.loads(tool_args)
+        except orjson.JSONDecodeError:
+            parsed_args = None
+        if isinstance(parsed_args, dict):
+            tool_args = parsed_args
+    
     return tool.invoke(tool_args)
@@ -9,9 +9,16 @@ from langchain_core.tools import tool
 # from utils.logger import logger
 from config.settings import get_config
 from firecrawl import FirecrawlApp
+from functools import lru_cache
 from typing import Dict
 
 
+@lru_cache(maxsize=1)
+def get_firecrawl_app() -> FirecrawlApp:
+    """Get the shared FireCrawl client, so searches reuse its HTTP session"""
+    return FirecrawlApp(api_key=get_config('firecrawl_api_key'))
+
+
 # Initialize search tool after ensuring API key is available
 @tool
 def web_search(query: str) -> Dict:
@@ -41,7 +48,7 @@ def web_search(query: str) -> Dict:
         }
     """
     try:
-        app = FirecrawlApp(api_key=get_config('firecrawl_api_key'))
+        app = get_firecrawl_app()
         
         response = app.search(
             query=query,
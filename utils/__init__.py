@@ -12,7 +12,11 @@ from .database import (
     backup_database,
     restore_database,
     check_database_health,
-    getDBConnection
+    getDBConnection,
+    getDBPool,
+    get_conn,
+    getHNSWParams,
+    configure_hnsw_params
 )
 
 # Conversation utilities
@@ -52,6 +56,10 @@ __all__ = [
     "restore_database",
     "check_database_health",
     "getDBConnection",
+    "getDBPool",
+    "get_conn",
+    "getHNSWParams",
+    "configure_hnsw_params",
     
     # Conversation
     "generate_new_thread_id",
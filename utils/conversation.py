@@ -130,7 +130,6 @@ def run_single_interaction(user_input: str, thread_id: str, user_id:str, app: Co
     
     final_response_streamed = False
     
-    logger.debug("==========================",initial_state)
     try:
         # Stream the interaction
         for step in app.stream(
@@ -4,9 +4,13 @@ Handles database initialization, connection management, and cleanup.
 """
 
 import os
-from typing import Optional, Dict, Any
-from psycopg import Connection
+import subprocess
+from contextlib import contextmanager
+from typing import Optional, Dict, Any, Iterator
+from psycopg import Connection, sql
 from psycopg.rows import dict_row
+from psycopg_pool import ConnectionPool
+from pgvector.psycopg import register_vector
 from typing import TYPE_CHECKING
 from config.settings import get_database_config
 
@@ -16,12 +20,43 @@ if TYPE_CHECKING:
 else:
     PGConnection = Connection
 
+def configure_hnsw_params(vector_count: int) -> Dict[str, int]:
+    """
+    Pick HNSW build and search parameters for the expected number of vectors.
+    
+    Larger graphs need more links per node and a wider search to keep recall
+    up, at the cost of build time and query latency. The index covers every
+    user, so a per-user search filters the graph's candidates afterwards;
+    max_scan_tuples bounds how far an iterative scan keeps going to find
+    enough rows for one user, and grows with the table.
+    
+    Args:
+        vector_count: Number of embeddings the index holds (an estimate is fine)
+        
+    Returns:
+        Dict with m, ef_construction, ef_search and max_scan_tuples
+    """
+    if vector_count < 100_000:
+        return {"m": 16, "ef_construction": 64, "ef_search": 40, "max_scan_tuples": 20_000}
+    if vector_count < 1_000_000:
+        return {"m": 24, "ef_construction": 100, "ef_search": 80, "max_scan_tuples": 50_000}
+    return {"m": 32, "ef_construction": 128, "ef_search": 100, "max_scan_tuples": 100_000}
+
+
 class DatabaseConnection():
     conn:PGConnection
+    pool:ConnectionPool
+    hnsw_params:Dict[str, int] = configure_hnsw_params(0)
 
     def setConnection(self, db_connection: Connection):
         self.conn = db_connection
 
+    def setPool(self, db_pool: ConnectionPool):
+        self.pool = db_pool
+
+    def setHNSWParams(self, hnsw_params: Dict[str, int]):
+        self.hnsw_params = hnsw_params
+
 DatabaseConn=DatabaseConnection()
 
 def initialize_database() -> PGConnection:
@@ -43,8 +78,9 @@ def initialize_database() -> PGConnection:
             row_factory=dict_row
         )
         
-        # Test the connection
-        with connection.cursor() as cursor:
+        # Test the connection. The schema setup runs as one transaction, so a
+        # failure part way through does not leave indexes dropped.
+        with connection.transaction(), connection.cursor() as cursor:
             cursor.execute("SELECT 1")
             cursor.fetchone()
 
@@ -58,21 +94,88 @@ def initialize_database() -> PGConnection:
                     user_id TEXT NOT NULL,
                     content TEXT NOT NULL,
                     importance TEXT DEFAULT 'medium',
-                    embedding vector(768),
+                    embedding halfvec(768),
                     created_at TIMESTAMP DEFAULT NOW()
                 );
             """)
 
-            # Optional: index for fast ANN search
+            # Tables created before halfvec storage still have vector(768);
+            # convert them like alembic revision 5f3a9c1d7e42 does. The old
+            # cosine indexes cannot hold halfvec, so they go first.
+            cursor.execute("""
+                SELECT format_type(atttypid, atttypmod) AS embedding_type
+                FROM pg_attribute
+                WHERE attrelid = 'semantic_memories'::regclass AND attname = 'embedding';
+            """)
+            if cursor.fetchone()["embedding_type"].startswith("vector"):
+                cursor.execute("DROP INDEX IF EXISTS idx_semantic_memories_embedding;")
+                cursor.execute("DROP INDEX IF EXISTS semantic_memories_embedding_hnsw;")
+                cursor.execute("""
+                    ALTER TABLE semantic_memories
+                    ALTER COLUMN embedding TYPE halfvec(768) USING embedding::halfvec(768);
+                """)
+
+            # Planner row estimate; exact counts would scan the whole table
+            cursor.execute("""
+                SELECT GREATEST(reltuples, 0)::bigint AS row_estimate
+                FROM pg_class WHERE oid = 'semantic_memories'::regclass;
+            """)
+            hnsw_params = configure_hnsw_params(cursor.fetchone()["row_estimate"])
+
+            # Index for fast ANN search (HNSW replaces the older ivfflat index).
+            # Embeddings are unit length, so the index uses inner product; rows
+            # stored before that are normalized once, when the index is built.
+            cursor.execute("DROP INDEX IF EXISTS idx_semantic_memories_embedding;")
+            cursor.execute("SELECT to_regclass('semantic_memories_embedding_hnsw_ip') AS ip_index;")
+            if cursor.fetchone()["ip_index"] is None:
+                cursor.execute("DROP INDEX IF EXISTS semantic_memories_embedding_hnsw;")
+                cursor.execute("""
+                    UPDATE semantic_memories
+                    SET embedding = l2_normalize(embedding)
+                    WHERE embedding IS NOT NULL;
+                """)
+                cursor.execute(sql.SQL("""
+                    CREATE INDEX semantic_memories_embedding_hnsw_ip
+                    ON semantic_memories
+                    USING hnsw (embedding halfvec_ip_ops)
+                    WITH (m = {m}, ef_construction = {ef_construction});
+                """).format(
+                    m=sql.Literal(hnsw_params["m"]),
+                    ef_construction=sql.Literal(hnsw_params["ef_construction"])
+                ))
+
+            # Per-user lookups and newest-first listing
             cursor.execute("""
-                CREATE INDEX IF NOT EXISTS idx_semantic_memories_embedding
-                ON semantic_memories
-                USING ivfflat (embedding vector_cosine_ops)
-                WITH (lists = 100);
+                CREATE INDEX IF NOT EXISTS ix_semantic_memories_user_id_created_at
+                ON semantic_memories (user_id, created_at);
             """)
             
+        # Pool for tool queries, so concurrent tool calls do not queue up
+        # behind each other and the checkpointer on the single connection.
+        # Each pooled connection registers the pgvector types, so embeddings
+        # are sent as binary halfvec instead of float text.
+        pool_size = db_config.get("pool_size", 5)
+        db_pool = ConnectionPool(
+            db_uri,
+            min_size=pool_size,
+            max_size=pool_size + db_config.get("max_overflow", 10),
+            max_idle=300,
+            timeout=60,
+            # psycopg's default prepare_threshold (5): statements repeated on a
+            # connection get prepared, one-off ones do not fill its cache.
+            # The retrieve query asks for prepare=True itself.
+            kwargs={
+                "autocommit": True,
+                "row_factory": dict_row
+            },
+            configure=register_vector,
+            open=True
+        )
+            
         print(f"PostgreSQL database initialized successfully at: {db_uri}")
         DatabaseConn.setConnection(connection)
+        DatabaseConn.setPool(db_pool)
+        DatabaseConn.setHNSWParams(hnsw_params)
         return connection
         
     except Exception as e:
@@ -82,8 +185,26 @@ def initialize_database() -> PGConnection:
 def getDBConnection():
     return DatabaseConn.conn
 
+def getDBPool():
+    return DatabaseConn.pool
+
+@contextmanager
+def get_conn() -> Iterator[PGConnection]:
+    """Borrow a connection from the shared pool for the duration of the block."""
+    with DatabaseConn.pool.connection() as conn:
+        yield conn
+
+def getHNSWParams():
+    return DatabaseConn.hnsw_params
+
 def cleanup_database(connection: Optional[PGConnection]) -> None:
-    """Close PostgreSQL connection."""
+    """Close PostgreSQL connection and the tool connection pool."""
+    db_pool = getattr(DatabaseConn, "pool", None)
+    if db_pool:
+        try:
+            db_pool.close()
+        except Exception as e:
+            print(f"Error closing database pool: {e}")
     if connection:
         try:
             connection.close()
@@ -95,36 +216,39 @@ def cleanup_database(connection: Optional[PGConnection]) -> None:
 def get_database_info(connection: PGConnection) -> Dict[str, Any]:
     """
     Get info about tables and row counts in PostgreSQL database.
+    
+    Row counts are the planner's estimates from pg_class.reltuples, so no
+    table is scanned; they are as fresh as the last VACUUM/ANALYZE.
     """
     try:
         db_info = {"tables": {}}
         with connection.cursor() as cursor:
             cursor.execute("""
-                SELECT table_name
-                FROM information_schema.tables
-                WHERE table_schema='public'
+                SELECT c.relname AS table_name, GREATEST(c.reltuples, 0)::bigint AS row_count
+                FROM pg_class c
+                JOIN pg_namespace n ON n.oid = c.relnamespace
+                WHERE n.nspname = 'public' AND c.relkind IN ('r', 'p')
             """)
-            tables = cursor.fetchall()
-
-            for (table_name,) in tables:
-                cursor.execute(f"SELECT COUNT(*) FROM {table_name}")
-                row_count = cursor.fetchone()[0]
-
-                cursor.execute(f"""
-                    SELECT column_name, data_type, is_nullable
-                    FROM information_schema.columns
-                    WHERE table_name = %s
-                """, (table_name,))
-                columns = cursor.fetchall()
-
-                db_info["tables"][table_name] = {
-                    "row_count": row_count,
-                    "columns": [
-                        {"name": c[0], "type": c[1], "not_null": c[2] == "NO"}
-                        for c in columns
-                    ]
+            for row in cursor.fetchall():
+                db_info["tables"][row["table_name"]] = {
+                    "row_count": row["row_count"],
+                    "columns": []
                 }
 
+            # All columns in one round trip instead of one query per table
+            cursor.execute("""
+                SELECT table_name, column_name, data_type, is_nullable
+                FROM information_schema.columns
+                WHERE table_schema = 'public'
+                ORDER BY table_name, ordinal_position
+            """)
+            for c in cursor.fetchall():
+                table = db_info["tables"].get(c["table_name"])
+                if table is not None:
+                    table["columns"].append(
+                        {"name": c["column_name"], "type": c["data_type"], "not_null": c["is_nullable"] == "NO"}
+                    )
+
         return db_info
 
     except Exception as e:
@@ -148,12 +272,20 @@ def vacuum_database(connection: PGConnection) -> bool:
 def backup_database(backup_path: str) -> bool:
     """
     Backup PostgreSQL database using pg_dump command.
+    
+    Writes a compressed custom-format archive; pg_dump writes straight to
+    the file, with no shell in between and no interpolation of the URI.
     """
     try:
         db_config = get_database_config()
         db_uri = db_config.get("uri")
 
-        os.system(f'pg_dump "{db_uri}" > "{backup_path}"')
+        with open(backup_path, "wb") as backup_file:
+            subprocess.run(
+                ["pg_dump", "--format=custom", "--compress=9", db_uri],
+                stdout=backup_file,
+                check=True
+            )
         print(f"Database backed up successfully to: {backup_path}")
         return True
     except Exception as e:
@@ -163,13 +295,21 @@ def backup_database(backup_path: str) -> bool:
 
 def restore_database(backup_path: str) -> bool:
     """
-    Restore PostgreSQL database using psql command.
+    Restore PostgreSQL database using pg_restore (custom-format archives,
+    restored in parallel) or psql (plain SQL dumps from older backups).
     """
     try:
         db_config = get_database_config()
         db_uri = db_config.get("uri")
 
-        os.system(f'psql "{db_uri}" < "{backup_path}"')
+        with open(backup_path, "rb") as backup_file:
+            is_archive = backup_file.read(5) == b"PGDMP"
+
+        if is_archive:
+            command = ["pg_restore", "--jobs=4", f"--dbname={db_uri}", backup_path]
+        else:
+            command = ["psql", db_uri, "--file", backup_path]
+        subprocess.run(command, check=True)
         print(f"Database restored successfully from: {backup_path}")
         return True
     except Exception as e:
@@ -188,12 +328,11 @@ def check_database_health(connection: PGConnection) -> dict:
 
     try:
         with connection.cursor() as cursor:
-            cursor.execute("SELECT 1;")
+            # One round trip proves the connection and reads the version
+            cursor.execute("SELECT version() AS version;")
+            health_report["version"] = cursor.fetchone()["version"]
             health_report["connection_ok"] = True
 
-            cursor.execute("SELECT version();")
-            health_report["version"] = cursor.fetchone()[0]
-
     except Exception as e:
         health_report["errors"].append(str(e))
 
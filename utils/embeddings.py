@@ -0,0 +1,278 @@
+"""
+Embedding model loading shared by the agent memory tools and the memories API.
+Selects the inference backend for the Nomic text embedding model.
+"""
+
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import List, Optional, TYPE_CHECKING
+import numpy as np
+from utils.logger import logger
+
+if TYPE_CHECKING:
+    from sentence_transformers import SentenceTransformer
+
+
+EMBEDDING_MODEL_NAME = "nomic-ai/nomic-embed-text-v1.5"
+
+# "torch" (default), "onnx" or "static"; the ONNX backend needs
+# optimum[onnxruntime] and the static backend needs model2vec
+EMBEDDING_BACKEND = (os.getenv("EMBEDDING_BACKEND") or "torch").lower()
+
+# Model2Vec model (hub id or local path) for the static backend. It must be
+# distilled from the Nomic model without PCA so it keeps 768 dimensions.
+EMBEDDING_STATIC_MODEL = os.getenv("EMBEDDING_STATIC_MODEL")
+
+# Width of the semantic_memories.embedding column
+EMBEDDING_DIMENSIONS = 768
+
+# ONNX file inside the model repo; the dynamically int8-quantized export by default
+EMBEDDING_ONNX_FILE = os.getenv("EMBEDDING_ONNX_FILE") or "onnx/model_quantized.onnx"
+
+# Local directory written by export_quantized_onnx_model(); the ONNX backend
+# loads from here instead of the hub when set
+EMBEDDING_ONNX_MODEL_DIR = os.getenv("EMBEDDING_ONNX_MODEL_DIR")
+
+# Directory for downloaded model files (and the model's remote code);
+# sentence-transformers' default cache when unset
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR")
+
+# Load the model when the API module is imported. With a preforking server
+# (gunicorn --preload) the parent loads it once and workers share its pages.
+EMBEDDING_PRELOAD = (os.getenv("EMBEDDING_PRELOAD") or "false").lower() in ("1", "true", "yes")
+
+# Intra-op threads for PyTorch inference; all cores by default
+EMBEDDING_NUM_THREADS = int(os.getenv("EMBEDDING_NUM_THREADS") or os.cpu_count() or 1)
+
+# Run the torch model in half precision when it lands on a GPU. Off by
+# default; CPU inference is never switched, since FP16 is slow there.
+EMBEDDING_FP16 = (os.getenv("EMBEDDING_FP16") or "false").lower() in ("1", "true", "yes")
+
+
+def _configure_torch() -> None:
+    """Give PyTorch inference every configured core and no inter-op thread pool."""
+    import torch
+    
+    torch.set_num_threads(EMBEDDING_NUM_THREADS)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        # Only allowed before any inter-op parallel work has started
+        logger.debug("PyTorch inter-op threads already initialized, leaving as is")
+
+
+def create_embedding_model() -> "SentenceTransformer":
+    """
+    Load the Nomic embedding model (768 dimensions) on the configured backend.
+    
+    The ONNX backend runs the int8-quantized graph through ONNX Runtime's
+    CPU kernels, which is several times faster than PyTorch on CPU. Pooling
+    and prefixes are unchanged, so embeddings stay comparable.
+    
+    The static backend replaces the transformer with a Model2Vec token
+    table and mean pooling, which embeds in well under a millisecond.
+    Its vectors live in a different space, so queries and stored memories
+    must both use it; re-embed existing rows after switching.
+    
+    Returns:
+        SentenceTransformer ready for encode()
+    """
+    # Imported here so torch is only loaded by processes that embed text
+    from sentence_transformers import SentenceTransformer
+    
+    if EMBEDDING_BACKEND == "static":
+        from sentence_transformers.models import StaticEmbedding
+        
+        if not EMBEDDING_STATIC_MODEL:
+            raise ValueError("EMBEDDING_STATIC_MODEL must be set when EMBEDDING_BACKEND=static")
+        
+        model = SentenceTransformer(modules=[StaticEmbedding.from_model2vec(EMBEDDING_STATIC_MODEL)])
+        if model.get_sentence_embedding_dimension() != EMBEDDING_DIMENSIONS:
+            raise ValueError(
+                f"Static embedding model {EMBEDDING_STATIC_MODEL} has "
+                f"{model.get_sentence_embedding_dimension()} dimensions, expected {EMBEDDING_DIMENSIONS}"
+            )
+        return model
+    
+    if EMBEDDING_BACKEND == "onnx":
+        return SentenceTransformer(
+            EMBEDDING_ONNX_MODEL_DIR or EMBEDDING_MODEL_NAME,
+            trust_remote_code=True,
+            cache_folder=EMBEDDING_CACHE_DIR,
+            backend="onnx",
+            model_kwargs={
+                "file_name": EMBEDDING_ONNX_FILE,
+                "provider": "CPUExecutionProvider"
+            }
+        )
+    
+    _configure_torch()
+    model = SentenceTransformer(
+        EMBEDDING_MODEL_NAME, trust_remote_code=True, cache_folder=EMBEDDING_CACHE_DIR
+    ).eval()
+    if EMBEDDING_FP16 and model.device.type == "cuda":
+        # Outputs are cast back to float32 by encode_texts
+        model.half()
+    return model
+
+
+def export_quantized_onnx_model(output_dir: str, quantization_config: str = "avx512_vnni") -> str:
+    """
+    Export the Nomic model to ONNX and quantize it to int8 for this CPU family.
+    
+    The hub's model_quantized.onnx is a generic int8 export; quantizing for
+    the deployment's instruction set ("avx512_vnni", "avx512" or "avx2")
+    lets ONNX Runtime use its fastest int8 GEMM kernels. Run once, then set
+    EMBEDDING_ONNX_MODEL_DIR to output_dir and EMBEDDING_ONNX_FILE to the
+    returned file name.
+    
+    Args:
+        output_dir: Directory to save the exported model in
+        quantization_config: optimum AutoQuantizationConfig preset name
+        
+    Returns:
+        Quantized ONNX file path relative to output_dir
+    """
+    from sentence_transformers import SentenceTransformer, export_dynamic_quantized_onnx_model
+    
+    model = SentenceTransformer(
+        EMBEDDING_MODEL_NAME,
+        trust_remote_code=True,
+        backend="onnx",
+        model_kwargs={"file_name": "onnx/model.onnx", "provider": "CPUExecutionProvider"}
+    )
+    model.save(output_dir)
+    export_dynamic_quantized_onnx_model(model, quantization_config, output_dir)
+    return f"onnx/model_qint8_{quantization_config}.onnx"
+
+
+_embedding_model: Optional["SentenceTransformer"] = None
+_embedding_model_lock = threading.Lock()
+
+
+def get_embedding_model() -> "SentenceTransformer":
+    """
+    Get the process-wide embedding model, loading it on first use.
+    
+    Memory tools run on worker threads, so the first load is guarded by a
+    lock; lru_cache alone would let two threads that miss at the same time
+    each load their own copy of the weights.
+    
+    Returns:
+        The shared SentenceTransformer instance
+    """
+    global _embedding_model
+    if _embedding_model is None:
+        with _embedding_model_lock:
+            if _embedding_model is None:
+                logger.debug("Loading Nomic embedding model...")
+                _embedding_model = create_embedding_model()
+                logger.debug("Nomic model loaded successfully!")
+    return _embedding_model
+
+
+def encode_texts(model: "SentenceTransformer", texts, **kwargs) -> np.ndarray:
+    """
+    Run model.encode() with autograd fully disabled.
+    
+    inference_mode is thread-local, so it is entered on every call rather
+    than once at load time; tool calls embed from worker threads.
+    
+    Args:
+        model: Embedding model to encode with
+        texts: A text or list of texts, already prefixed
+        **kwargs: Passed through to encode()
+        
+    Returns:
+        Normalized float32 embeddings
+    """
+    import torch
+    
+    with torch.inference_mode():
+        embeddings = model.encode(texts, convert_to_numpy=True, normalize_embeddings=True, **kwargs)
+    return embeddings.astype(np.float32, copy=False)
+
+
+# Embeddings of recently seen texts, keyed by the SHA-256 of the prefixed text
+# so long memories are not kept alive as cache keys
+EMBEDDING_CACHE_SIZE = 4096
+_embedding_cache: "OrderedDict[bytes, bytes]" = OrderedDict()
+_embedding_cache_lock = threading.Lock()
+
+
+def _cache_key(text: str) -> bytes:
+    return hashlib.sha256(text.encode("utf-8")).digest()
+
+
+def _cache_get(key: bytes) -> Optional[bytes]:
+    with _embedding_cache_lock:
+        value = _embedding_cache.get(key)
+        if value is not None:
+            _embedding_cache.move_to_end(key)
+        return value
+
+
+def _cache_put(key: bytes, value: bytes) -> None:
+    with _embedding_cache_lock:
+        _embedding_cache[key] = value
+        _embedding_cache.move_to_end(key)
+        while len(_embedding_cache) > EMBEDDING_CACHE_SIZE:
+            _embedding_cache.popitem(last=False)
+
+
+def _encode_to_bytes(model: "SentenceTransformer", text: str) -> bytes:
+    """Encode text and keep the result as immutable float32 bytes in the embedding cache."""
+    key = _cache_key(text)
+    value = _cache_get(key)
+    if value is None:
+        value = encode_texts(model, text).tobytes()
+        _cache_put(key, value)
+    return value
+
+
+def encode_batch_cached(model: "SentenceTransformer", texts: List[str], **kwargs) -> np.ndarray:
+    """
+    Embed several (already prefixed) texts, encoding only the cache misses.
+    
+    Misses go through a single encode() call and are added to the cache
+    shared with encode_cached_array.
+    
+    Args:
+        model: Embedding model to encode with
+        texts: Texts to embed, including their search_query/search_document prefix
+        **kwargs: Passed through to encode()
+        
+    Returns:
+        (len(texts), dim) float32 embeddings, in input order
+    """
+    keys = [_cache_key(text) for text in texts]
+    cached = [_cache_get(key) for key in keys]
+    missing = [i for i, value in enumerate(cached) if value is None]
+    
+    if missing:
+        encoded = encode_texts(model, [texts[i] for i in missing], **kwargs)
+        for i, embedding in zip(missing, encoded):
+            cached[i] = embedding.tobytes()
+            _cache_put(keys[i], cached[i])
+    
+    return np.frombuffer(b"".join(cached), dtype=np.float32).reshape(len(texts), -1)
+
+
+def encode_cached_array(model: "SentenceTransformer", text: str) -> np.ndarray:
+    """
+    Embed a single (already prefixed) text, reusing earlier results.
+    
+    Repeated queries and re-stored phrases skip the transformer forward
+    pass entirely. The array is a read-only view over the cached float32
+    bytes, so it can be handed to the pgvector binary dumper without copying.
+    
+    Args:
+        model: Embedding model to encode with
+        text: Text to embed, including its search_query/search_document prefix
+        
+    Returns:
+        Read-only float32 embedding array
+    """
+    return np.frombuffer(_encode_to_bytes(model, text), dtype=np.float32)
@@ -1,6 +1,15 @@
 import re
 from utils.logger import logger
 
+# Closing code fence left at the end of an answer
+_TRAILING_FENCE_RE = re.compile(r'```\s*$')
+
+# A ReAct "Action: ... Action Input: ..." pair. Either value may start on the
+# line after its marker, and other lines (a Thought) may sit between the two.
+ACTION_RE = re.compile(
+    r"Action:\s*(?P<action>[^\n]+?)[ \t]*\r?\n[\s\S]*?Action Input:\s*(?P<action_input>[^\n]+)"
+)
+
 def extract_final_answer(content: str) -> str:
     """
     Extract the final answer from ReAct format response.
@@ -12,14 +21,17 @@ def extract_final_answer(content: str) -> str:
     Returns:
         str: Clean final answer without the thought process
     """
-    # Find the position after "Final Answer:"
-    final_answer_pos = content.find("Final Answer:") + len("Final Answer:")
+    # Find the position after "Final Answer:"; keep the whole content if
+    # the marker is missing rather than slicing from a bogus offset
+    final_answer_pos = content.find("Final Answer:")
+    if final_answer_pos >= 0:
+        content = content[final_answer_pos + len("Final Answer:"):]
     
     # Extract everything after "Final Answer:"
-    answer = content[final_answer_pos:].strip()
+    answer = content.strip()
     
     # Remove trailing backticks and cleanup
-    answer = re.sub(r'```\s*$', '', answer).strip()
+    answer = _TRAILING_FENCE_RE.sub('', answer).strip()
     
-    logger.debug(f"Extracted final answer: {answer}")
+    logger.debug("Extracted final answer: {}", answer)
     return answer
\ No newline at end of file
@@ -3,44 +3,202 @@ Streaming utilities for real-time response display.
 Handles different types of streaming output for better user experience.
 """
 
+import os
+import re
+import sys
 import time
-from typing import Optional, Iterator, Any, Callable
+from typing import Optional, Iterator, Any, Callable, Tuple
 from config.settings import get_streaming_config
 from langchain.schema import BaseMessage, PromptValue, AIMessage
 from langchain.schema.runnable import Runnable
 from utils.logger import logger
 from typing import Sequence, Any
-from utils.response_extractor import extract_final_answer
+from utils.response_extractor import extract_final_answer, ACTION_RE
 
 
-def stream_response2(llm_with_tools:Runnable[PromptValue | str | Sequence[BaseMessage | list[str] | tuple[str, str] | str | dict[str, Any]], BaseMessage], formatted_prompt) -> None:
+# The tool name after an "Action:" marker, once its line is complete
+_ACTION_NAME_RE = re.compile(r"Action:\s*(?P<action>[^\n]+?)[ \t]*\r?\n")
+
+
+class TokenBatcher:
+    """
+    Buffers streamed tokens and writes them to stdout in batches.
+    
+    Writing (and flushing) every token costs a syscall per token; batching by
+    count or elapsed time keeps the output real-time at a fraction of the cost.
+    """
+    
+    def __init__(self, max_tokens: int = 16, max_delay: float = 0.05):
+        """
+        Initialize the batcher.
+        
+        Args:
+            max_tokens: Number of buffered tokens that triggers a flush
+            max_delay: Seconds since the last flush that triggers a flush
+        """
+        self.max_tokens = max_tokens
+        self.max_delay = max_delay
+        self._buffer = []
+        self._last_flush = time.monotonic()
+    
+    def add(self, token: str) -> None:
+        """Buffer a token, flushing if the batch is full or stale."""
+        self._buffer.append(token)
+        if len(self._buffer) >= self.max_tokens or time.monotonic() - self._last_flush > self.max_delay:
+            self.flush()
+    
+    def flush(self) -> None:
+        """
+        Write out all buffered tokens.
+        
+        On a terminal the batch goes straight to the file descriptor, skipping
+        the TextIOWrapper encode/lock layer; the batcher already decides when
+        output is due, so line buffering is not needed. Piped or redirected
+        output keeps going through sys.stdout to preserve its buffering.
+        """
+        if self._buffer:
+            text = "".join(self._buffer)
+            self._buffer.clear()
+            if _stdout_is_tty():
+                # Anything written via print() must reach the fd first
+                sys.stdout.flush()
+                data = text.encode("utf-8", "replace")
+                fd = sys.stdout.fileno()
+                while data:
+                    data = data[os.write(fd, data):]
+            else:
+                sys.stdout.write(text)
+                sys.stdout.flush()
+        self._last_flush = time.monotonic()
+
+
+def _stdout_is_tty() -> bool:
+    """Check whether stdout is a real terminal backed by a file descriptor."""
+    try:
+        return sys.stdout.isatty() and sys.stdout.fileno() >= 0
+    except (AttributeError, ValueError, OSError):
+        return False
+
+
+def _action_input_complete(buffer: str, action_pos: int) -> bool:
+    """
+    Check whether the Action Input for the "Action:" at action_pos has been fully generated.
+    
+    Uses the same pattern as parse_action_from_response, and waits for the
+    newline ending a non-blank Action Input value, so the stream is never
+    closed before the parser can read the whole tool call.
+    """
+    match = ACTION_RE.match(buffer, action_pos)
+    return bool(match) and match.end() < len(buffer) and bool(match.group("action_input").strip())
+
+
+def _completed_action_name(buffer: str, action_pos: int) -> Optional[str]:
+    """Return the tool name following the "Action:" at action_pos once its line is complete."""
+    match = _ACTION_NAME_RE.match(buffer, action_pos)
+    return match.group("action").strip() or None if match else None
+
+
+class StreamInterrupted(Exception):
+    """Raised by stream_response2 when the stream fails after part of the answer was displayed."""
+    
+    def __init__(self, displayed: str):
+        super().__init__("Streaming stopped after part of the final answer was displayed")
+        self.displayed = displayed
+
+
+def stream_response2(
+    llm_with_tools:Runnable[PromptValue | str | Sequence[BaseMessage | list[str] | tuple[str, str] | str | dict[str, Any]], BaseMessage],
+    formatted_prompt,
+    prefix: str = "",
+    on_action: Optional[Callable[[str], None]] = None
+) -> Tuple[str, bool]:
+    """
+    Stream an LLM response in a single pass, displaying only the final answer.
+    
+    Tokens are echoed once "Final Answer:" shows up. If an "Action:" marker
+    appears first the response is a tool call: nothing is displayed and the
+    stream is cancelled as soon as the "Action Input:" line is complete, since
+    anything generated after it is discarded anyway.
+    
+    Args:
+        llm_with_tools: LLM runnable to stream from
+        formatted_prompt: Prompt to send to the LLM
+        prefix: Text displayed right before the first streamed answer token
+        on_action: Called with the tool name as soon as the "Action:" line is
+            complete, while the Action Input is still being generated
+        
+    Returns:
+        tuple: (content, echoed) - the full raw content generated by the LLM,
+        and whether the final answer was displayed while streaming
+        
+    Raises:
+        StreamInterrupted: If the stream fails after answer text was displayed;
+            its displayed attribute holds that text, without the prefix
+    """
     found_final_answer = False
+    strip_next = False
+    answer_start = 0
+    is_tool_call = False
+    action_announced = False
+    action_pos = -1
     buffer = ""
-    streamed_content = ""
-    for chunk in llm_with_tools.stream(formatted_prompt):
-        if chunk.content:
-            # print(chunk.content, end='', flush=True)
-            streamed_content += chunk.content
+    batcher = TokenBatcher()
+    stream = llm_with_tools.stream(formatted_prompt)
+    try:
+        for chunk in stream:
+            if not chunk.content:
+                continue
             buffer += chunk.content
-            # Check if we've hit "Final Answer:" and haven't started streaming yet
-            if not found_final_answer and "Final Answer:" in buffer:
-                found_final_answer = True
-                # Find the position after "Final Answer:"
-                final_answer_pos = buffer.find("Final Answer:") + len("Final Answer:")
-                # Get content after "Final Answer:" and stream it
-                after_final_answer = buffer[final_answer_pos:].strip()
-                if after_final_answer:
-                    print(after_final_answer, end='', flush=True)
-                    # ai_message = AIMessage(content=after_final_answer)
             
-            # If we're already streaming, display new tokens
-            elif found_final_answer:
-                print(chunk.content, end='', flush=True)
-
-    if found_final_answer:
-        clean_answer = extract_final_answer(streamed_content)
-        ai_message = AIMessage(content=clean_answer)
-        return ai_message
+            # If we're already streaming, display new tokens; whitespace is
+            # dropped until the first answer text, wherever the chunks split
+            if found_final_answer:
+                token = chunk.content
+                if strip_next:
+                    token = token.lstrip()
+                    if not token:
+                        continue
+                    strip_next = False
+                batcher.add(token)
+                continue
+            
+            if not is_tool_call:
+                action_pos = buffer.find("Action:")
+                final_answer_pos = buffer.find("Final Answer:")
+                if action_pos != -1 and (final_answer_pos == -1 or action_pos < final_answer_pos):
+                    is_tool_call = True
+                elif final_answer_pos != -1:
+                    found_final_answer = True
+                    # Get content after "Final Answer:" and stream it; only leading
+                    # whitespace is dropped, trailing spaces separate the next chunk
+                    answer_start = final_answer_pos + len("Final Answer:")
+                    after_final_answer = buffer[answer_start:].lstrip()
+                    strip_next = not after_final_answer
+                    batcher.add(prefix + after_final_answer)
+                    continue
+                else:
+                    continue
+            
+            # Tool call - announce the tool, then stop generating once the Action Input line is complete
+            if on_action and not action_announced:
+                tool_name = _completed_action_name(buffer, action_pos)
+                if tool_name:
+                    action_announced = True
+                    on_action(tool_name)
+            if _action_input_complete(buffer, action_pos):
+                break
+    except Exception as e:
+        if found_final_answer:
+            raise StreamInterrupted(buffer[answer_start:].lstrip()) from e
+        raise
+    finally:
+        batcher.flush()
+        # Cancels the underlying generation if we stopped early
+        close = getattr(stream, "close", None)
+        if close:
+            close()
+
+    return buffer, found_final_answer
 
 def stream_response(content: str, delay: Optional[float] = None) -> None:
     """